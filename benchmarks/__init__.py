@@ -0,0 +1,3 @@
+"""
+This directory contains micro-benchmarks for the hot paths of `mibomi`.
+"""
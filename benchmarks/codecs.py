@@ -0,0 +1,404 @@
+"""
+Measures decoding and encoding every packet type defined in the ``.mbm``
+files, over randomized but valid payloads synthesized from their
+definitions, and saves the results as JSON so that they can be compared
+between commits:
+
+    python -m benchmarks.codecs --output before.json
+    python -m benchmarks.codecs --compare before.json
+
+Decoding uses the generated classes over a `DataReader`, and encoding
+their ``write`` method into both a `DataWriter` and a `DataRW`.
+"""
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+
+from generator import parser
+from mibomi import protocols
+from mibomi.datatypes import (
+    DataReader, DataRW, DataWriter, Position, Rotation, Slot, nbt,
+    serverbound, types
+)
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# Definitions of the protocol that `types` and `serverbound` belong to
+MBM = os.path.join(ROOT, 'generator', 'protocols', str(protocols.DEFAULT))
+
+# (mbm file, generated module) pairs for both directions
+SOURCES = [
+    ('clientbound', os.path.join(MBM, 'clientbound.mbm'), types),
+    ('serverbound', os.path.join(MBM, 'serverbound.mbm'), serverbound),
+]
+
+# Inclusive ranges for every struct format
+_RANGES = {
+    'b': (-1 << 7, (1 << 7) - 1), 'B': (0, (1 << 8) - 1),
+    'h': (-1 << 15, (1 << 15) - 1), 'H': (0, (1 << 16) - 1),
+    'i': (-1 << 31, (1 << 31) - 1), 'I': (0, (1 << 32) - 1),
+    'q': (-1 << 63, (1 << 63) - 1), 'Q': (0, (1 << 64) - 1),
+}
+
+# Relative change of a metric that is reported as a regression. Timings
+# on a busy machine easily vary by 10% between runs of the same code.
+TOLERANCE = 0.20
+
+
+class Synthesizer:
+    """
+    Builds random instances of the generated classes by following their
+    definitions, picking values that satisfy their conditions as often as
+    not, so that every branch is exercised.
+    """
+    def __init__(self, rng, definitions, module):
+        self.rng = rng
+        self.module = module
+        self.definitions = {d.cls: d for d in definitions}
+
+    def packet(self, definition):
+        choices = self._condition_choices(definition)
+        values = {}
+        for arg in definition.args:
+            if not isinstance(arg, parser.ArgDefinition):
+                continue
+            if arg.name in choices and self.rng.random() < 0.8:
+                values[arg.name] = self.rng.choice(choices[arg.name])
+            else:
+                values[arg.name] = self.value(arg, values)
+
+        return getattr(self.module, definition.cls).create(**values)
+
+    def value(self, arg, values):
+        if arg.optional and self.rng.random() < 0.5:
+            return None
+
+        if arg.vec_count_cls:
+            count = self.rng.randrange(8)
+            if arg.cls == 'u8':
+                return self.bytes(self.rng.randrange(256))
+            return [self.single(arg, values) for _ in range(count)]
+
+        return self.single(arg, values)
+
+    def single(self, arg, values):
+        cls = arg.cls
+        fmt = parser.TYPE_TO_FMT.get(cls)
+        if fmt in _RANGES:
+            return self.rng.randint(*_RANGES[fmt])
+        elif fmt == '?':
+            return self.rng.random() < 0.5
+        elif fmt == 'f':
+            # Pick values that survive being packed as single precision
+            return float(self.rng.randrange(-1 << 16, 1 << 16)) / 4
+        elif fmt == 'd':
+            return self.rng.uniform(-1e6, 1e6)
+        elif cls in ('vari32', 'vari64'):
+            return self.rng.randrange(1 << self.rng.choice((7, 14, 21, 28)))
+        elif cls == 'str':
+            return self.str()
+        elif cls == 'bytes':
+            return self.bytes(self.rng.randrange(64))
+        elif cls == 'uuid':
+            return uuid.UUID(int=self.rng.getrandbits(128))
+        elif cls == 'pos':
+            return self.position()
+        elif cls == 'nbt':
+            return self.nbt()
+        elif cls == 'slot':
+            return self.slot()
+        elif cls == 'entmeta':
+            return self.entmeta()
+        else:
+            # Parameters are only needed by the nested type when written
+            return self.packet(self.definitions[cls])
+
+    def str(self):
+        return ''.join(self.rng.choice(string.ascii_letters)
+                       for _ in range(self.rng.randrange(32)))
+
+    def bytes(self, n):
+        return bytes(self.rng.getrandbits(8) for _ in range(n))
+
+    def position(self):
+        return Position(self.rng.randrange(-1 << 25, 1 << 25),
+                        self.rng.randrange(256),
+                        self.rng.randrange(-1 << 25, 1 << 25))
+
+    def nbt(self, depth=0):
+        tags = [
+            nbt.TagByte('byte', self.rng.randrange(-128, 128)),
+            nbt.TagInt('int', self.rng.getrandbits(31)),
+            nbt.TagLong('long', self.rng.getrandbits(63)),
+            nbt.TagDouble('double', self.rng.random()),
+            nbt.TagString('string', self.str()),
+            nbt.TagIntArray('ints', tuple(range(self.rng.randrange(16)))),
+            nbt.TagList('list', [nbt.TagShort(None, i) for i in range(4)]),
+        ]
+        if depth < 2:
+            tags.append(self.nbt(depth + 1))
+        return nbt.TagCompound('compound', self.rng.sample(
+            tags, self.rng.randrange(1, len(tags) + 1)))
+
+    def slot(self):
+        if self.rng.random() < 0.3:
+            return None
+        return Slot(self.rng.randrange(1, 400), self.rng.randrange(1, 65),
+                    self.rng.randrange(16),
+                    self.nbt() if self.rng.random() < 0.3 else None)
+
+    def entmeta(self):
+        rng = self.rng
+        makers = [
+            (0, lambda: rng.randrange(256)),
+            (1, lambda: rng.randrange(1 << 21)),
+            (2, lambda: rng.random()),
+            (3, self.str),
+            (6, lambda: rng.random() < 0.5),
+            (7, lambda: Rotation(0.0, 90.0, 180.0)),
+            (8, self.position),
+            (9, lambda: self.position() if rng.random() < 0.5 else None),
+            (12, lambda: rng.randrange(100) if rng.random() < 0.5 else None),
+        ]
+        return [(index, cls, maker()) for index, (cls, maker) in enumerate(
+            rng.sample(makers, rng.randrange(len(makers))))]
+
+    def _condition_choices(self, definition):
+        """
+        Returns ``{name: [values]}`` that make the conditions true.
+        """
+        choices = {}
+        for arg in definition.args:
+            if not isinstance(arg, parser.Condition):
+                continue
+
+            value = ast.literal_eval(arg.value)
+            if arg.op == '==':
+                options = [value]
+            elif arg.op == 'in':
+                options = list(value)
+            elif arg.op == '!=':
+                options = [value + 1]
+            elif arg.op == '>':
+                options = [value + 1 + self.rng.randrange(4)]
+            elif arg.op == '&':
+                options = [value | (self.rng.getrandbits(8) & ~value)]
+            else:
+                continue
+
+            choices.setdefault(arg.name, []).extend(options)
+
+        return choices
+
+
+def synthesize(count, seed=0):
+    """
+    Returns ``{name: (cls, [(packet, payload)])}`` for every packet type
+    with an ID in both directions, with `count` random packets each.
+    """
+    result = {}
+    rng = random.Random(seed)
+    for direction, path, module in SOURCES:
+        with open(path) as fd:
+            definitions = list(parser.parse_str(fd.read()))
+
+        synthesizer = Synthesizer(rng, definitions, module)
+        for definition in definitions:
+            if definition.id is None or definition.params:
+                continue
+
+            cls = getattr(module, definition.cls)
+            packets = []
+            for _ in range(count):
+                packet = synthesizer.packet(definition)
+                data = DataWriter()
+                packet.write(data)
+                payload = data.getvalue()
+                cls(DataReader(payload))  # make sure that it's valid
+                packets.append((packet, payload))
+
+            result['{}.{}'.format(direction, definition.cls)] = cls, packets
+
+    return result
+
+
+class _Timer:
+    """
+    Times calling `function` over all `items`, repeating them enough
+    times for every measurement to take at least `min_time`.
+    """
+    def __init__(self, function, items, min_time=0.005):
+        self.function = function
+        self.items = items
+        self.number = 1
+        while self._time() < min_time:
+            self.number *= 2
+        self.best = float('inf')
+
+    def _time(self):
+        function = self.function
+        start = time.perf_counter()
+        for _ in range(self.number):
+            for item in self.items:
+                function(item)
+        return time.perf_counter() - start
+
+    def measure(self):
+        self.best = min(self.best, self._time() / self.number)
+
+
+def _retained(cls, payloads):
+    """
+    Returns the bytes and allocated blocks kept alive per decoded packet.
+    """
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [cls(DataReader(payload)) for payload in payloads]
+    used = tracemalloc.get_traced_memory()[0] - before
+    blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    del kept
+    return used / len(payloads), blocks / len(payloads)
+
+
+def measure(suites, rounds):
+    """
+    Measures every ``{name: (cls, [(packet, payload)])}`` suite, taking
+    the best of `rounds` for each. Every round goes over all the suites,
+    so that the machine slowing down for a while affects all of them.
+    """
+    timers = {}
+    for name, (cls, packets) in suites.items():
+        payloads = [payload for _, payload in packets]
+        objects = [packet for packet, _ in packets]
+        timers[name] = (
+            _Timer(lambda p, cls=cls: cls(DataReader(p)), payloads),
+            _Timer(lambda p: p.write(DataWriter()), objects),
+            _Timer(lambda p: p.write(DataRW()), objects),
+        )
+
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            for name in suites:
+                for timer in timers[name]:
+                    timer.measure()
+    finally:
+        gc.enable()
+
+    results = {}
+    for name, (cls, packets) in suites.items():
+        n = len(packets)
+        size = sum(len(payload) for _, payload in packets)
+        decode, encode, encode_rw = (t.best for t in timers[name])
+        retained_bytes, retained_blocks = _retained(
+            cls, [payload for _, payload in packets])
+        results[name] = {
+            'size': size / n,
+            'decode_pps': n / decode,
+            'decode_mbps': size / decode / 1e6,
+            'encode_pps': n / encode,
+            'encode_mbps': size / encode / 1e6,
+            'encode_datarw_pps': n / encode_rw,
+            'retained_bytes': retained_bytes,
+            'retained_blocks': retained_blocks,
+        }
+
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(count, rounds, seed):
+    results = measure(synthesize(count, seed), rounds)
+    print('{:<48} {:>16} {:>13} {:>16}'.format(
+        'packet', 'decode', '', 'encode'))
+    for name, metrics in sorted(results.items()):
+        print('{:<48} {:>10.0f} pkt/s {:>8.1f} MB/s {:>10.0f} pkt/s'.format(
+            name, metrics['decode_pps'], metrics['decode_mbps'],
+            metrics['encode_pps']))
+
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'count': count,
+        'seed': seed,
+        'packets': results,
+    }
+
+
+def compare(old, new, tolerance=TOLERANCE):
+    """
+    Prints how every metric changed from `old` to `new` results, and
+    returns how many of them got worse by more than the `tolerance`.
+    """
+    regressions = 0
+    print('{} -> {}'.format(old.get('commit'), new.get('commit')))
+    for name, metrics in sorted(new['packets'].items()):
+        before = old['packets'].get(name)
+        if not before:
+            continue
+
+        for metric, value in sorted(metrics.items()):
+            # Sizes are given, and the MB/s follow the packets per second
+            if metric == 'size' or metric.endswith('_mbps') \
+                    or not before.get(metric):
+                continue
+
+            change = value / before[metric] - 1
+            # Lower is better for anything retained, higher for rates
+            worse = change > tolerance if metric.startswith('retained') \
+                else change < -tolerance
+            if worse:
+                regressions += 1
+                print('{:<48} {:<18} {:>+7.1%}'.format(name, metric, change))
+
+    print('{} regressions over {:.0%}'.format(regressions, tolerance))
+    return regressions
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--count', type=int, default=100,
+                      help='random packets of every type')
+    args.add_argument('--rounds', type=int, default=5,
+                      help='rounds to take the best time of')
+    args.add_argument('--seed', type=int, default=0)
+    args.add_argument('--output', help='file to save the results to')
+    args.add_argument('--compare', metavar='OLD',
+                      help='results to compare against (and fail if worse)')
+    args.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = args.parse_args(argv)
+
+    results = run(args.count, args.rounds, args.seed)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(results, fd, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fd:
+            if compare(json.load(fd), results, args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
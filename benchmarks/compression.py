@@ -0,0 +1,62 @@
+"""
+Compares the CPU time spent per megabyte compressing and decompressing
+packets with each compression mode, either over a capture file given as
+the first argument (see `samples.read_capture`), or a synthetic one.
+
+Only packets at least as large as the threshold are considered, since
+smaller ones are never compressed.
+"""
+import sys
+import time
+import zlib
+
+from mibomi.network import connection
+
+from . import samples
+
+THRESHOLD = 256
+
+MODES = [
+    ('zlib.compress (old)', zlib.compress),
+    ('level -1 (default)', lambda x: connection.compress(x, -1)),
+    ('level 1 (fast)', lambda x: connection.compress(x, 1)),
+    ('level 0 (stored)', lambda x: connection.compress(x, 0)),
+]
+
+
+def _cpu(function, items, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.process_time()
+        for item in items:
+            function(item)
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main(path=None, rounds=3):
+    if path:
+        packets = samples.read_capture(path)
+    else:
+        packets = [payload for _, payload in samples.packet_mix(5000)]
+
+    packets = [x for x in packets if len(x) >= THRESHOLD]
+    mb = sum(map(len, packets)) / (1024 * 1024)
+    print('{} packets, {:.2f} MB uncompressed'.format(len(packets), mb))
+    print('{:<24} {:>12} {:>12} {:>8} {:>14}'.format(
+        'mode', 'compress', 'decompress', 'ratio', 'decompress old'))
+
+    for name, function in MODES:
+        compressed = [function(x) for x in packets]
+        pairs = [(c, len(x)) for c, x in zip(compressed, packets)]
+        ratio = sum(map(len, compressed)) / (mb * 1024 * 1024)
+        comp = _cpu(function, packets, rounds)
+        new = _cpu(lambda p: connection.decompress(*p), pairs, rounds)
+        old = _cpu(zlib.decompress, compressed, rounds)
+        print('{:<24} {:>7.1f} ms/MB {:>7.1f} ms/MB {:>7.1%} {:>8.1f} ms/MB'
+              .format(name, comp / mb * 1e3, new / mb * 1e3, ratio,
+                      old / mb * 1e3))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,66 @@
+"""
+Compares decoding a realistic mix of packets with the generated classes,
+which use ``__slots__`` and precompiled structs, against the same classes
+generated as they used to be, with a ``__dict__`` and ``readfmt`` calls.
+Both read from a `DataReader`.
+"""
+import collections
+import time
+import tracemalloc
+
+from mibomi.datatypes import DataReader
+
+from . import samples
+
+
+def _measure(packets, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for cls, payload in packets:
+            cls(DataReader(payload))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _memory(packets):
+    """
+    Returns the bytes used by every decoded packet on average.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [cls(DataReader(payload)) for cls, payload in packets]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / len(packets)
+
+
+def main(count=20000, rounds=5):
+    legacy = samples.legacy_types()
+    packets = samples.packet_mix(count)
+    by_type = collections.defaultdict(list)
+    for cls, payload in packets:
+        by_type[cls].append(payload)
+
+    print('{:<28} {:>8} {:>12} {:>12} {:>8} {:>9} {:>9}'.format(
+        'packet', 'count', 'old', 'new', 'speedup', 'old mem', 'new mem'))
+
+    rows = [('<mix>', packets)] + sorted((
+        (cls.__name__, [(cls, payload) for payload in payloads])
+        for cls, payloads in by_type.items()), key=lambda x: -len(x[1]))
+
+    for name, new_items in rows:
+        old_items = [(legacy.TYPES[cls.ID], payload)
+                     for cls, payload in new_items]
+        old = _measure(old_items, rounds)
+        new = _measure(new_items, rounds)
+        print('{:<28} {:>8} {:>9.2f} us {:>9.2f} us {:>7.2f}x '
+              '{:>7.0f} B {:>7.0f} B'.format(
+                  name, len(new_items), old / len(new_items) * 1e6,
+                  new / len(new_items) * 1e6, old / new,
+                  _memory(old_items), _memory(new_items)))
+
+
+if __name__ == '__main__':
+    main()
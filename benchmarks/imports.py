@@ -0,0 +1,92 @@
+"""
+Measures how long it takes to start using `mibomi`, each scenario in a
+fresh interpreter so that nothing is cached between runs, along with
+the modules that ``python -X importtime`` reports as the slowest ones
+to import (including those they import in turn) for ``import mibomi``.
+
+Bytecode is always cached (and warmed up first), as it would be once
+installed, since compiling the generated modules takes longer than
+actually running them.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+ENV = dict(os.environ)
+ENV.pop('PYTHONDONTWRITEBYTECODE', None)
+
+# (name, code) of every scenario, timed after the interpreter starts
+SCENARIOS = [
+    ('python', 'pass'),
+    ('import mibomi', 'import mibomi'),
+    ('import mibomi.network', 'from mibomi.network import Client'),
+    ('decode one type', 'from mibomi.datatypes import types\n'
+                        'types.TYPES[types.ChunkData.ID]'),
+    ('create every type', 'from mibomi.datatypes import types\n'
+                          'list(types.TYPES.values())'),
+    ('online dependencies', 'import mibomi, aiohttp, cryptography.hazmat.'
+                            'primitives.ciphers'),
+]
+
+_TIMED = '''
+import time
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)
+'''
+
+
+def _run(code):
+    """
+    Runs the code in a new interpreter and returns how long it took.
+    """
+    out = subprocess.run(
+        [sys.executable, '-c', _TIMED.format(code)], cwd=ROOT, env=ENV,
+        check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return float(out)
+
+
+def _slowest(count):
+    """
+    Returns the ``(cumulative seconds, module)`` that took the longest
+    to import for ``import mibomi``.
+    """
+    err = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import mibomi'], cwd=ROOT,
+        env=ENV, check=True, stderr=subprocess.PIPE,
+        universal_newlines=True).stderr
+
+    result = []
+    for line in err.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _self, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                result.append((int(cumulative) / 1e6, name.strip()))
+
+    return sorted(result, reverse=True)[:count]
+
+
+def main(rounds=7, count=15):
+    # Write the bytecode of every module
+    _run('import mibomi.network, mibomi.protocols\n'
+         'mibomi.protocols.load()')
+    print('{:<24} {:>10} {:>10}'.format('scenario', 'best', 'median'))
+    for name, code in SCENARIOS:
+        try:
+            times = sorted(_run(code) for _ in range(rounds))
+        except subprocess.CalledProcessError:
+            print('{:<24} {:>10}'.format(name, 'failed'))
+            continue
+        print('{:<24} {:>7.1f} ms {:>7.1f} ms'.format(
+            name, times[0] * 1e3, times[len(times) // 2] * 1e3))
+
+    print()
+    print('slowest imports for "import mibomi" (cumulative):')
+    for seconds, module in _slowest(count):
+        print('{:>7.1f} ms  {}'.format(seconds * 1e3, module))
+
+
+if __name__ == '__main__':
+    main()
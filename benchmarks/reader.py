@@ -0,0 +1,68 @@
+"""
+Compares decoding a realistic mix of packets with `DataRW` (a `BytesIO`)
+against doing so with the offset-based `DataReader`.
+
+The generated packet classes unpack straight from a `DataReader`, so the
+ones using ``readfmt`` are generated again to compare both readers.
+"""
+import collections
+import time
+
+from mibomi.datatypes import Chunk, DataRW, DataReader
+
+from . import samples
+
+
+def _measure(packets, reader_cls, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for cls, payload in packets:
+            cls(reader_cls(payload))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _measure_chunks(chunks, cls, reader_cls, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for payload in chunks:
+            Chunk(cls(reader_cls(payload)))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(count=20000, rounds=5):
+    legacy = samples.legacy_types()
+    packets = [(legacy.TYPES[cls.ID], payload)
+               for cls, payload in samples.packet_mix(count)]
+    by_type = collections.defaultdict(list)
+    for cls, payload in packets:
+        by_type[cls].append((cls, payload))
+
+    print('{:<28} {:>8} {:>12} {:>12} {:>8}'.format(
+        'packet', 'count', 'DataRW', 'DataReader', 'speedup'))
+
+    rows = [('<mix>', packets)] + sorted(
+        ((cls.__name__, items) for cls, items in by_type.items()),
+        key=lambda x: -len(x[1]))
+
+    for name, items in rows:
+        old = _measure(items, DataRW, rounds)
+        new = _measure(items, DataReader, rounds)
+        print('{:<28} {:>8} {:>9.2f} us {:>9.2f} us {:>7.2f}x'.format(
+            name, len(items), old / len(items) * 1e6,
+            new / len(items) * 1e6, old / new))
+
+    chunk_data = legacy.ChunkData
+    chunks = [payload for cls, payload in packets if cls is chunk_data][:50]
+    old = _measure_chunks(chunks, chunk_data, DataRW, rounds)
+    new = _measure_chunks(chunks, chunk_data, DataReader, rounds)
+    print('{:<28} {:>8} {:>9.2f} us {:>9.2f} us {:>7.2f}x'.format(
+        'Chunk(ChunkData)', len(chunks), old / len(chunks) * 1e6,
+        new / len(chunks) * 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Helpers to build client-bound packet payloads similar to those sent by
+a real server, in roughly the proportion they arrive after spawning.
+"""
+import io
+import json
+import os
+import random
+import uuid
+from types import ModuleType
+
+from generator import generator, parser, pygen
+from mibomi import protocols
+from mibomi.datatypes import DataRW, DataReader, types
+
+CLIENT_MBM = os.path.join(
+    os.path.dirname(__file__), '..', 'generator', 'protocols',
+    str(protocols.DEFAULT), 'clientbound.mbm')
+
+
+def _entity_relative_move(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.writefmt('hhh?', rng.randrange(-4096, 4096), rng.randrange(-512, 512),
+               rng.randrange(-4096, 4096), rng.random() < 0.8)
+
+
+def _entity_look_and_relative_move(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.writefmt('hhhBB?', rng.randrange(-4096, 4096), 0,
+               rng.randrange(-4096, 4096), rng.randrange(256),
+               rng.randrange(256), True)
+
+
+def _entity_head_look(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.writefmt('B', rng.randrange(256))
+
+
+def _entity_velocity(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.writefmt('hhh', rng.randrange(-800, 800), rng.randrange(-800, 800),
+               rng.randrange(-800, 800))
+
+
+def _entity_teleport(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.writefmt('dddBB?', rng.uniform(-1e4, 1e4), rng.uniform(0, 256),
+               rng.uniform(-1e4, 1e4), rng.randrange(256),
+               rng.randrange(256), True)
+
+
+def _entity_metadata(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.write(b'\x00\x00\x00\x01\x01\xac\x02\x06\x06\x00\xff')
+
+
+def _spawn_mob(rng, _):
+    _.writevari32(rng.randrange(1, 5000))
+    _.writeuuid(uuid.UUID(int=rng.getrandbits(128)))
+    _.writevari32(rng.randrange(50, 120))
+    _.writefmt('dddBBBhhh', rng.uniform(-1e4, 1e4), 64.0,
+               rng.uniform(-1e4, 1e4), 0, 0, 0, 0, 0, 0)
+    _.write(b'\x00\x00\x00\x01\x01\xac\x02\x06\x06\x00\xff')
+
+
+def _time_update(rng, _):
+    _.writefmt('qq', rng.randrange(1 << 32), rng.randrange(24000))
+
+
+def _keep_alive(rng, _):
+    _.writefmt('q', rng.getrandbits(63))
+
+
+def _block_change(rng, _):
+    _.writepos((rng.randrange(-1000, 1000), rng.randrange(256),
+                rng.randrange(-1000, 1000)))
+    _.writevari32(rng.randrange(4096) << 4)
+
+
+def _multi_block_change(rng, _):
+    _.writefmt('ii', rng.randrange(-60, 60), rng.randrange(-60, 60))
+    count = rng.randrange(2, 64)
+    _.writevari32(count)
+    for _i in range(count):
+        _.writefmt('BB', rng.randrange(256), rng.randrange(256))
+        _.writevari32(rng.randrange(256) << 4)
+
+
+def _explosion(rng, _):
+    _.writefmt('ffff', rng.uniform(-1e4, 1e4), 64.0,
+               rng.uniform(-1e4, 1e4), 4.0)
+    count = rng.randrange(50, 300)
+    _.writefmt('i', count)
+    for _i in range(count):
+        _.writefmt('bbb', rng.randrange(-4, 5), rng.randrange(-4, 5),
+                   rng.randrange(-4, 5))
+    _.writefmt('fff', 0.0, 0.0, 0.0)
+
+
+def _chat_message(rng, _):
+    words = ['hello', 'world', 'diamond', 'player', 'joined', 'the', 'game']
+    _.writestr(json.dumps({'translate': 'chat.type.text', 'with': [
+        {'text': 'Player{}'.format(rng.randrange(100))},
+        ' '.join(rng.choice(words) for _i in range(rng.randrange(5, 200)))
+    ]}))
+    _.writefmt('B', 0)
+
+
+def _chunk_data(rng, _):
+    payload = chunk_payload(rng, 4)
+    _.writefmt('ii?', rng.randrange(-60, 60), rng.randrange(-60, 60), True)
+    _.writevari32(0b1111)
+    _.writevari32(len(payload))
+    _.write(payload)
+    _.writevari32(0)
+
+
+def chunk_payload(rng, sections, bits_per_block=4, over_world=True):
+    """
+    Builds the data of a chunk with the given amount of sections.
+    """
+    _ = DataRW()
+    for _i in range(sections):
+        _.write(bytes((bits_per_block,)))
+        palette = rng.sample(range(1, 256), 1 << bits_per_block)
+        _.writevari32(len(palette))
+        for block_id in palette:
+            _.writevari32(block_id << 4)
+
+        length = 4096 * bits_per_block // 64
+        _.writevari32(length)
+        _.writefmt('Q' * length, *(rng.getrandbits(64) for _ in range(length)))
+        _.write(bytes(2048))
+        if over_world:
+            _.write(b'\xff' * 2048)
+
+    _.write(bytes(256))
+    return _.getvalue()
+
+
+# (weight, class, builder) in the proportion they're usually received
+MIX = [
+    (30, types.EntityRelativeMove, _entity_relative_move),
+    (20, types.EntityLookAndRelativeMove, _entity_look_and_relative_move),
+    (15, types.EntityHeadLook, _entity_head_look),
+    (10, types.EntityVelocity, _entity_velocity),
+    (5, types.EntityTeleport, _entity_teleport),
+    (5, types.EntityMetadata, _entity_metadata),
+    (2, types.SpawnMob, _spawn_mob),
+    (3, types.TimeUpdate, _time_update),
+    (1, types.KeepAlive, _keep_alive),
+    (3, types.BlockChange, _block_change),
+    (2, types.MultiBlockChange, _multi_block_change),
+    (4, types.ChunkData, _chunk_data),
+    (2, types.ChatMessage, _chat_message),
+    (1, types.Explosion, _explosion),
+]
+
+
+def packet_mix(count, seed=0):
+    """
+    Returns a list with `count` ``(cls, payload)`` tuples, where the
+    payload does not include the Packet ID.
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in MIX]
+    result = []
+    for _i in range(count):
+        _w, cls, builder = rng.choices(MIX, weights)[0]
+        _ = DataRW()
+        builder(rng, _)
+        result.append((cls, _.getvalue()))
+
+    return result
+
+
+def read_capture(path):
+    """
+    Reads a capture file, made of uncompressed length-prefixed packets
+    (Packet ID and data) one after another, as a list of `bytes`.
+    """
+    with open(path, 'rb') as fd:
+        data = DataReader(fd.read())
+
+    result = []
+    while data.offset != len(data.buffer):
+        result.append(data.read(data.readvari32()))
+
+    return result
+
+
+def legacy_types():
+    """
+    Generates the packet classes as they used to be, with a ``__dict__``
+    and reading values through ``readfmt`` (so they also work with
+    `DataRW`), into a new module.
+    """
+    out = io.StringIO()
+    gen = pygen.PyGen(out)
+    generator.generate_header(gen, compiled=False)
+    with open(CLIENT_MBM) as fd:
+        for definition in parser.parse_str(fd.read()):
+            generator.generate_class(gen, definition)
+
+    module = ModuleType('legacy_types')
+    exec(out.getvalue(), module.__dict__)
+    return module
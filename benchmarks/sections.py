@@ -0,0 +1,142 @@
+"""
+Compares decoding the packed block arrays of chunk sections with the
+pure Python loop against doing so with NumPy, for every common amount
+of bits per block (some of which make blocks span two longs), as well
+as decoding entire chunks either way, and without unpacking them at all,
+as done unless a written block doesn't fit packed.
+
+Then, it compares the memory used by a section made of a single block
+(which share their data until written), one as received, once some
+blocks are written into it, once unpacked into an array, and with the
+list of `int` used before.
+"""
+import random
+import time
+import tracemalloc
+
+from mibomi.datatypes import Chunk, chunk, types
+
+from . import samples
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BITS_PER_BLOCK = [4, 5, 6, 8, 13]
+
+
+def _measure(function, rounds, *args):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _unpack_all(unpack, sections, bpb):
+    for longs, palette in sections:
+        unpack(longs, bpb, palette)
+
+
+def _decode_chunks(chunks, use_numpy=None):
+    """
+    Decodes the chunks, also unpacking all of their sections unless
+    `use_numpy` is ``None``.
+    """
+    chunk.USE_NUMPY = bool(use_numpy)
+    try:
+        for data in chunks:
+            sections = Chunk(data).sections
+            if use_numpy is not None:
+                for section in sections:
+                    section._unpack()
+    finally:
+        chunk.USE_NUMPY = True
+
+
+def _memory(build, count):
+    """
+    Returns the bytes used on average by each of `count` built values.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used / count
+
+
+def _written(data):
+    section = Chunk(data).sections[0]
+    for i in range(0, chunk.SECTION_SIZE, 64):
+        section[i % 16, i // 256, i // 16 % 16] = i % 20
+    return section
+
+
+def _unpacked(data, storage=None):
+    section = Chunk(data).sections[0]
+    section._unpack()
+    if storage is not None:
+        section._blocks = storage(section._blocks)
+    return section
+
+
+def main(count=200, rounds=5):
+    if not numpy:
+        print('numpy is not installed, so there is nothing to compare')
+        return
+
+    rng = random.Random(0)
+    print('{:<20} {:>8} {:>12} {:>12} {:>8}'.format(
+        'bits per block', 'count', 'loop', 'numpy', 'speedup'))
+
+    for bpb in BITS_PER_BLOCK:
+        length = -(-chunk.SECTION_SIZE * bpb // 64)
+        sections = [(
+            bytes(rng.getrandbits(8) for _ in range(length * 8)),
+            [rng.randrange(4096) for _ in range(1 << bpb)]
+            if bpb <= 8 else None
+        ) for _ in range(count)]
+
+        old = _measure(_unpack_all, rounds,
+                       chunk._unpack_blocks_loop, sections, bpb)
+        new = _measure(_unpack_all, rounds, lambda *args: (
+            chunk._unpack_blocks_numpy(numpy, *args)), sections, bpb)
+        print('{:<20} {:>8} {:>9.2f} us {:>9.2f} us {:>7.2f}x'.format(
+            bpb, count, old / count * 1e6, new / count * 1e6, old / new))
+
+    chunks = [types.ChunkData.create(
+        x=0, z=0, new_chunk=True, bit_mask=0xffff,
+        data=samples.chunk_payload(rng, 16), block_entities=[]
+    ) for _ in range(count // 10)]
+
+    old = _measure(_decode_chunks, rounds, chunks, False)
+    new = _measure(_decode_chunks, rounds, chunks, True)
+    print('{:<20} {:>8} {:>9.2f} us {:>9.2f} us {:>7.2f}x'.format(
+        'Chunk (16 sections)', len(chunks), old / len(chunks) * 1e6,
+        new / len(chunks) * 1e6, old / new))
+
+    lazy = _measure(_decode_chunks, rounds, chunks)
+    print('{:<20} {:>8} {:>9.2f} us (sections left packed)'.format(
+        'Chunk (16 sections)', len(chunks), lazy / len(chunks) * 1e6))
+
+    print()
+    chunks = [types.ChunkData.create(
+        x=0, z=0, new_chunk=True, bit_mask=1,
+        data=samples.chunk_payload(rng, 1), block_entities=[]
+    ) for _ in range(count)]
+    print('{:<20} {:>12}'.format('section storage', 'memory'))
+    for name, build in (
+            ('uniform', lambda i: chunk.Section.uniform(i % 3)),
+            ('packed', lambda i: Chunk(chunks[i]).sections[0]),
+            ('packed and written', lambda i: _written(chunks[i])),
+            ('array', lambda i: _unpacked(chunks[i])),
+            ('list of int (old)', lambda i: _unpacked(chunks[i], list))):
+        print('{:<20} {:>10.0f} B'.format(name, _memory(build, count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Compares scanning a region of the world block by block against doing so
+with the bulk queries of `World`, both with NumPy and without it, as well
+as finding the nearest block of a kind by brute force against doing so
+with `World.find_nearest`, and the height of columns by looking at their
+blocks from the top against `World.height_at`.
+"""
+import random
+import time
+
+from mibomi.datatypes import Chunk, World, blocks, chunk, types
+
+from . import samples
+
+
+def _measure(function, rounds, *args):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_world(rng, radius=3):
+    """
+    Returns a `World` with random chunks around the origin.
+    """
+    world = World()
+    for cx in range(-radius, radius):
+        for cz in range(-radius, radius):
+            world.feed_chunk(Chunk(types.ChunkData.create(
+                x=cx, z=cz, new_chunk=True, bit_mask=0xff,
+                data=samples.chunk_payload(rng, 8), block_entities=[])))
+    return world
+
+
+def _scan(world, x0, y0, z0, x1, y1, z1):
+    return [world[x, y, z]
+            for y in range(y0, y1)
+            for z in range(z0, z1)
+            for x in range(x0, x1)]
+
+
+def _brute_nearest(world, block_ids, radius):
+    return min((
+        (x * x + y * y + z * z, (x, 64 + y, z))
+        for x in range(-radius, radius + 1)
+        for y in range(-radius, radius + 1)
+        for z in range(-radius, radius + 1)
+        if world[x, 64 + y, z] in block_ids
+    ), default=None)
+
+
+def _top_down(world, columns):
+    for x, z in columns:
+        for y in range(255, -1, -1):
+            if blocks.is_solid(world[x, y, z]):
+                break
+
+
+def _heights(world, columns, cached):
+    if not cached:
+        for chunk_ in world._chunks.values():
+            chunk_._heightmap = None
+    for x, z in columns:
+        world.height_at(x, z)
+
+
+def _bulk(query, use_numpy, *args):
+    chunk.USE_NUMPY = use_numpy
+    try:
+        query(*args)
+    finally:
+        chunk.USE_NUMPY = True
+
+
+def main(size=64, rounds=3):
+    world = make_world(random.Random(0))
+    box = -size // 2, 32, -size // 2, size // 2, 32 + size, size // 2
+    coords = [(x, y, z)
+              for y in range(box[1], box[4], 4)
+              for z in range(box[2], box[5], 2)
+              for x in range(box[0], box[3])]
+
+    print('{:<28} {:>12}'.format('query', 'time'))
+    for name, function, args in (
+            ('world[x, y, z] (box)', _scan, (world, *box)),
+            ('get_box', _bulk, (world.get_box, False, *box)),
+            ('get_box (numpy)', _bulk, (world.get_box, True, *box)),
+            ('world[x, y, z] (coords)',
+             lambda: [world[xyz] for xyz in coords], ()),
+            ('get_blocks', _bulk, (world.get_blocks, False, coords)),
+            ('get_blocks (numpy)', _bulk, (world.get_blocks, True, coords))):
+        print('{:<28} {:>9.2f} ms'.format(
+            name, _measure(function, rounds, *args) * 1e3))
+
+    # Most sections have none of the blocks, and a few have some
+    block_ids = {1000}
+    for x, y, z in ((20, 100, 20), (-30, 10, 5), (3, 70, -2)):
+        world[x, y, z] = 1000
+
+    radius = 24
+    print()
+    for name, function, args in (
+            ('brute force nearest', _brute_nearest,
+             (world, block_ids, radius)),
+            ('find_nearest', _bulk, (world.find_nearest, False, block_ids,
+                                     (0, 64, 0), radius)),
+            ('find_nearest (numpy)', _bulk, (world.find_nearest, True,
+                                             block_ids, (0, 64, 0), radius))):
+        print('{:<28} {:>9.2f} ms'.format(
+            name, _measure(function, rounds, *args) * 1e3))
+
+    columns = [(x, z) for x in range(-48, 48) for z in range(-48, 48)]
+    print()
+    for name, function, args in (
+            ('top-down height', _top_down, (world, columns)),
+            ('height_at (building)', _heights, (world, columns, False)),
+            ('height_at', _heights, (world, columns, True))):
+        print('{:<28} {:>9.2f} ms'.format(
+            name, _measure(function, rounds, *args) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
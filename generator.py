@@ -1,12 +1,22 @@
+import os
+
 import generator.parser
 import generator.generator
 import generator.pygen
 
 
-CLIENT_MBM = 'generator/clientbound.mbm'
-SERVER_TYPES = 'mibomi/datatypes/types.py'
+# Every folder in here has the definitions of a protocol version, and
+# is turned into a package with the same version in `PROTOCOLS_OUT`.
+PROTOCOLS_MBM = 'generator/protocols'
+PROTOCOLS_OUT = 'mibomi/protocols'
+
+CLIENT_MBM = 'clientbound.mbm'
+SERVER_TYPES = 'types.py'
+
+SERVER_MBM = 'serverbound.mbm'
+CLIENT_TYPES = 'serverbound.py'
 
-SERVER_MBM = 'generator/serverbound.mbm'
+# The methods work with any version, but are made from the latest one
 CLIENT_METHODS = 'mibomi/network/requester.py'
 
 
@@ -28,33 +38,58 @@ class RepetitionChecker:
         self.names.clear()
 
 
-if __name__ == '__main__':
+def generate_types(definitions, path, base):
     rep = RepetitionChecker()
-    with open(CLIENT_MBM) as fin,\
-            generator.pygen.PyGen(open(SERVER_TYPES, 'w')) as gen:
-        gen.writeln('import io')
-        gen.writeln('import pprint')
-        gen.writeln('TYPES = {}')
-        with gen.block('class ServerType:'):
-            with gen.meth('__repr__'):
-                gen.writeln('x = io.StringIO()')
-                gen.writeln('pprint.pprint(self.__dict__, stream=x)')
-                gen.writeln('return x.getvalue().rstrip()')
-
-        for definition in generator.parser.parse_str(fin.read()):
+    with generator.pygen.PyGen(open(path, 'w')) as gen:
+        generator.generator.generate_header(
+            gen, base=base, datatypes='...datatypes.')
+        structs = {}
+        records = {}
+        for definition in definitions:
             rep.check(definition)
-            generator.generator.generate_class(gen, definition)
+            generator.generator.generate_class(
+                gen, definition, structs, records, base=base)
+        generator.generator.generate_footer(gen, definitions)
+
+
+def generate_protocol(version):
+    with open(os.path.join(PROTOCOLS_MBM, str(version), CLIENT_MBM)) as fin:
+        client = list(generator.parser.parse_str(fin.read()))
+    with open(os.path.join(PROTOCOLS_MBM, str(version), SERVER_MBM)) as fin:
+        server = list(generator.parser.parse_str(fin.read()))
 
-    rep.clear()
-    with open(SERVER_MBM) as fin, \
-            generator.pygen.PyGen(open(CLIENT_METHODS, 'w')) as gen:
+    out = os.path.join(PROTOCOLS_OUT, 'v{}'.format(version))
+    os.makedirs(out, exist_ok=True)
+    with generator.pygen.PyGen(
+            open(os.path.join(out, '__init__.py'), 'w')) as gen:
+        gen.writeln('"""')
+        gen.writeln('Client-bound `types` and `serverbound` ones '
+                    'of the protocol {}.', version)
+        gen.writeln('"""')
+        gen.writeln('from . import types, serverbound')
+        gen.writeln('VERSION = {}', version)
+
+    generate_types(client, os.path.join(out, SERVER_TYPES), 'ServerType')
+    # The same types, to be read on the server side (or written as a whole)
+    generate_types(server, os.path.join(out, CLIENT_TYPES), 'ClientType')
+    return server
+
+
+if __name__ == '__main__':
+    versions = sorted(int(x) for x in os.listdir(PROTOCOLS_MBM))
+    for version in versions:
+        definitions = generate_protocol(version)
+
+    rep = RepetitionChecker()
+    with generator.pygen.PyGen(open(CLIENT_METHODS, 'w')) as gen:
         gen.writeln('from . import connection')
-        gen.writeln('from ..datatypes import DataRW')
         gen.writeln('import typing')
         gen.writeln('from uuid import UUID')
-        gen.writeln('from ..datatypes import Position, Slot, DataRW')
+        gen.writeln('from ..datatypes import Position, Slot, DataWriter')
 
         with gen.block('class Requester(connection.Connection):'):
-            for definition in generator.parser.parse_str(fin.read()):
+            gen.writeln('# The protocol in use, from `mibomi.protocols`')
+            gen.writeln('protocol = None')
+            for definition in definitions:
                 rep.check(definition)
                 generator.generator.generate_method(gen, definition)
@@ -1,3 +1,5 @@
+import struct
+
 from . import pygen, parser
 
 
@@ -9,14 +11,95 @@ _BUILTIN_CLS = {
 }
 
 
-def generate_class(gen: pygen.PyGen, definition: parser.Definition):
+def generate_header(gen: pygen.PyGen, compiled=True, base='ServerType',
+                    datatypes='.'):
+    """
+    Generates the imports and `base` class needed by
+    the classes made with `generate_class`, which are
+    imported from the relative `datatypes` package.
+
+    If `compiled`, the classes use ``__slots__`` instead of a
+    ``__dict__``, which the base class must use as well, and
+    they can be created out of their values with ``create``.
+    Then, ``TYPES`` is made by `generate_footer` instead.
     """
-    Generates a Python class for the given parser definition.
+    gen.writeln('import io')
+    gen.writeln('import pprint')
+    if compiled:
+        gen.writeln('import struct')
+        gen.writeln('from {}lazy import LazyTypes', datatypes)
+        gen.writeln('from {}vector import StructVector', datatypes)
+    else:
+        gen.writeln('TYPES = {}')
+
+    with gen.block('class {}:', base):
+        if compiled:
+            gen.writeln('__slots__ = ()')
+            gen.writeln('@classmethod')
+            with gen.func('create', 'cls', '**fields'):
+                gen.writeln('self = cls.__new__(cls)')
+                with gen.block('for name in cls.__slots__:'):
+                    gen.writeln('setattr(self, name, fields.pop(name, None))')
+                with gen.block('if fields:'):
+                    gen.writeln("raise TypeError('unknown fields {}'"
+                                ".format(', '.join(fields)))")
+                gen.writeln('return self')
+        with gen.meth('__repr__'):
+            gen.writeln('x = io.StringIO()')
+            if compiled:
+                gen.writeln('pprint.pprint({name: getattr(self, name, None) '
+                            'for name in self.__slots__}, stream=x)')
+            else:
+                gen.writeln('pprint.pprint(self.__dict__, stream=x)')
+            gen.writeln('return x.getvalue().rstrip()')
+
+
+def generate_class(gen: pygen.PyGen, definition: parser.Definition,
+                   structs=None, records=None, base='ServerType'):
+    """
+    Generates a Python class for the given parser definition,
+    which inherits from the `base` made by `generate_header`.
 
     It will have a single input parameter, ``data``, that should
-    be a class able to ease reading data from a byte stream.
+    be a class able to ease reading data from a byte stream. Its
+    ``write`` method does the opposite, and writes the instance
+    into the given ``data``, such as a `DataWriter`.
+
+    Classes with an ID and no parameters also have a ``write_fields``
+    static method, which writes the fields given as arguments in the
+    same order as they're defined (see `generate_method`), so that
+    they can be sent without creating an instance.
+
+    If a `structs` dictionary is given, the class defines ``__slots__``,
+    and consecutive values are unpacked straight from the ``buffer`` at
+    the ``offset`` of a `DataReader` through module-level ``Struct``'s,
+    which are defined before the class the first time they're needed
+    and saved into the dictionary as ``{format: name}``.
+
+    If a `records` dictionary is given too, classes without an ID made
+    only of values with a fixed size are saved into it as ``{class:
+    format}``, and vectors of those are read as a `StructVector`.
+
+    Classes using `structs` are not created right away, but defined
+    inside a ``_make_<class>`` function to be called on first use
+    through the ``TYPES`` made by `generate_footer`. Otherwise, the
+    class is saved into ``TYPES`` if it has an ID.
     """
-    with gen.block('class {}(ServerType):', definition.cls):
+    fixed_fmt = None
+    lazy = gen.empty()
+    if structs is not None:
+        _generate_structs(gen, definition, structs)
+        if records is not None and definition.id is None:
+            fixed_fmt = _fixed_fmt(definition)
+        lazy = gen.func('_make_' + definition.cls)
+
+    with lazy, gen.block('class {}({}):', definition.cls, base):
+        if structs is not None:
+            gen.writeln('__qualname__ = {!r}', definition.cls)
+            gen.writeln('__slots__ = ({})', ''.join(
+                '{!r}, '.format(arg.name) for arg in definition.args
+                if isinstance(arg, parser.ArgDefinition)))
+
         if definition.id is not None:
             gen.writeln('ID = 0x{:x}', definition.id)
 
@@ -25,12 +108,74 @@ def generate_class(gen: pygen.PyGen, definition: parser.Definition):
             if not definition.args:
                 gen.writeln('pass')
             else:
-                _generate_read_method(gen, definition)
+                _generate_read_method(gen, definition, structs, records)
+
+        with gen.meth('write', 'data', *definition.params):
+            if not definition.args:
+                gen.writeln('pass')
+            else:
+                _generate_write_method(gen, definition, 'data', 'self.')
 
-    if definition.id is not None:
+        if definition.id is not None and not definition.params:
+            gen.writeln('@staticmethod')
+            with gen.func('write_fields', '_', *_field_args(definition)):
+                if not definition.args:
+                    gen.writeln('pass')
+                else:
+                    # The writer can't be called `data`, as fields can
+                    _generate_write_method(gen, definition, '_')
+
+        if fixed_fmt:
+            gen.writeln('@classmethod')
+            with gen.func('_make', 'cls', 'values'):
+                gen.writeln('self = cls.__new__(cls)')
+                for arg in definition.args:
+                    gen.write('self.{}, ', arg.name)
+                gen.writeln('= values')
+                gen.writeln('return self')
+
+            records[definition.cls] = fixed_fmt
+
+    if structs is not None:
+        with lazy:
+            gen.writeln('return {}', definition.cls)
+    elif definition.id is not None:
         gen.writeln('TYPES[0x{:x}] = {}', definition.id, definition.cls)
 
 
+def generate_footer(gen: pygen.PyGen, definitions, compiled=True):
+    """
+    Generates ``NAMES``, which maps the Packet ID of the given
+    definitions to their name, so that these can be known without
+    creating any class.
+
+    If `compiled`, it also generates the ``TYPES`` mapping of Packet
+    ID to class, creating them on first use, along with the module's
+    ``__getattr__`` to create the rest of classes when accessed.
+    """
+    definitions = list(definitions)
+    with gen.block('NAMES = {'):
+        for definition in definitions:
+            if definition.id is not None:
+                gen.writeln('0x{:x}: {!r},', definition.id, definition.name)
+    gen.writeln('}')
+
+    if not compiled:
+        return
+
+    with gen.block('TYPES = LazyTypes(globals(), {'):
+        for definition in definitions:
+            if definition.id is not None:
+                gen.writeln('0x{:x}: {!r},', definition.id, definition.cls)
+    with gen.block('}, {'):
+        for definition in definitions:
+            depend = _depend(definition)
+            if depend:
+                gen.writeln('{!r}: {!r},', definition.cls, depend)
+    gen.writeln('})')
+    gen.writeln('__getattr__ = TYPES.load')
+
+
 def generate_method(gen: pygen.PyGen, definition: parser.Definition):
     """
     Generates a Python method for the given parser definition.
@@ -38,28 +183,100 @@ def generate_method(gen: pygen.PyGen, definition: parser.Definition):
     The method will have a ``self`` parameter and N extra parameters
     (some may be optional), to accommodate those of the definition.
 
-    The method will create a data-read-writer to serialize its
-    payload before finally sending it over the wire.
+    The method will write its arguments into a data-writer through the
+    ``write_fields`` of the class with the same name found in the
+    server-bound types of the ``protocol`` in use, without creating
+    an instance, before finally sending it over the wire, so that
+    the same method works for every version.
     """
     if definition.params:
         raise NotImplementedError
 
     args = []
+    fields = []
+    for arg in _method_args(definition):
+        args.append('{}: {}'.format(arg.name, arg.typing()))
+        fields.append(arg.name)
+        if arg.optional or arg.referenced:
+            args[-1] += '=None'  # Optional/referenced args may be omitted
+
+    with gen.ameth(definition.name, *args):
+        gen.writeln('cls = self.protocol.serverbound.{}', definition.cls)
+        gen.writeln('_ = DataWriter(cls.ID)')
+        gen.writeln('cls.write_fields({})', ', '.join(('_', *fields)))
+        gen.writeln('await self.send_packet(_)')
+
+
+def _method_args(definition):
+    """
+    Yields the arguments taken by the method made by `generate_method`.
+    """
     for arg in definition.args:
         if not isinstance(arg, parser.ArgDefinition):
             break  # Break as soon as we find a conditional or reference
-        else:
-            args.append('{}: {}'.format(arg.name, arg.typing()))
-            if arg.optional or arg.referenced:
-                args[-1] += '=None'  # Optional/referenced args may be omitted
+        yield arg
+
+
+def _field_args(definition):
+    """
+    Returns the parameters for ``write_fields``, which start with those
+    of the method made by `generate_method` so they can be positional.
+    """
+    method_args = list(_method_args(definition))
+    params = []
+    for arg in definition.args:
+        if isinstance(arg, parser.ArgDefinition):
+            params.append(arg.name)
+            if arg.optional or arg.referenced or arg not in method_args:
+                params[-1] += '=None'
+    return params
+
+
+def _generate_structs(gen, definition, structs):
+    """
+    Defines the ``Struct``'s used by the definition not yet in `structs`.
+    """
+    for group in _collapse_args(definition.args):
+        if isinstance(group, list):
+            fmt = ''.join(arg.builtin_fmt for arg in group)
+            if fmt not in structs:
+                structs[fmt] = '_S_' + fmt.replace('?', '_')
+                gen.writeln('{} = struct.Struct({!r})',
+                            structs[fmt], '>' + fmt)
+
+
+def _depend(definition):
+    """
+    Returns a tuple with the classes the definition's class uses.
+    """
+    depend = []
+    for arg in definition.args:
+        if (isinstance(arg, parser.ArgDefinition)
+                and arg.cls not in parser.TYPE_TO_FMT
+                and arg.cls not in _BUILTIN_CLS
+                and arg.cls not in depend):
+            depend.append(arg.cls)
+
+    return tuple(depend)
 
-    with gen.ameth(definition.name, *args):
-        gen.writeln('_ = DataRW()')
-        _generate_write_method(gen, definition)
-        gen.writeln('await self.send(0x{:x}, _.getvalue())', definition.id)
 
+def _fixed_fmt(definition):
+    """
+    Returns the format of the definition if all of its arguments are
+    required values with a fixed size, or ``None`` otherwise.
+    """
+    if definition.params or not definition.args:
+        return None
+
+    for arg in definition.args:
+        if (not isinstance(arg, parser.ArgDefinition)
+                or not arg.builtin_fmt or arg.optional or arg.vec_count_cls):
+            return None
+
+    return ''.join(arg.builtin_fmt for arg in definition.args)
 
-def _generate_read_method(gen, definition):
+
+def _generate_read_method(gen, definition, structs=None, records=None):
     """
     This is the part where the class actually reads its arguments.
     """
@@ -90,7 +307,12 @@ def _generate_read_method(gen, definition):
             for arg in group:
                 fmt += arg.builtin_fmt
                 gen.write('self.{}, ', arg.name)
-            gen.writeln('= data.readfmt({!r})', fmt)
+            if structs is None:
+                gen.writeln('= data.readfmt({!r})', fmt)
+            else:
+                gen.writeln('= {}.unpack_from(data.buffer, data.offset)',
+                            structs[fmt])
+                gen.writeln('data.offset += {}', struct.calcsize('>' + fmt))
         else:
             group: parser.ArgDefinition = group
             optional = gen.empty().__enter__()
@@ -102,11 +324,22 @@ def _generate_read_method(gen, definition):
             if group.vec_count_cls:
                 # Special case vectors of u8 as byte strings
                 if group.cls == 'u8':
-                    gen.write('data.read(')
+                    # Checking the length only if `DataReader` is used
+                    gen.write('data.read(' if structs is None
+                              else 'data.readexactly(')
                     _generate_read1(gen, group.vec_count_cls)
                     gen.writeln(')')
                     optional.__exit__()
                     continue
+                elif records and group.cls in records:
+                    # Keep the packed records, which are unpacked on access
+                    fmt = records[group.cls]
+                    gen.write('StructVector({}, {}, data.readexactly(',
+                              group.cls, structs[fmt])
+                    _generate_read1(gen, group.vec_count_cls)
+                    gen.writeln(' * {}))', struct.calcsize('>' + fmt))
+                    optional.__exit__()
+                    continue
                 else:
                     gen.write('[')
 
@@ -137,10 +370,15 @@ def _generate_read1(gen, cls, args=()):
         gen.write(')')
 
 
-def _generate_write_method(gen, definition):
+def _generate_write_method(gen, definition, target, prefix=''):
     """
-    This is the part where the class actually writes its parameters.
+    This is the part where the class actually writes its parameters,
+    into the `target` data-writer, from the variables with the given
+    `prefix` (such as ``'self.'``) before their name.
     """
+    def value(name):
+        return name if name in definition.params else prefix + name
+
     condition = gen.empty().__enter__()
     for group in _collapse_args(definition.args):
         if isinstance(group, parser.ConditionDisable):
@@ -148,44 +386,55 @@ def _generate_write_method(gen, definition):
             condition = gen.empty().__enter__()
         elif isinstance(group, parser.Condition):
             condition.__exit__()
-            gen.write('if ')
-            condition = gen.block(
-                '{} {} {}:', group.name, group.op, group.value).__enter__()
+            condition = gen.block('if {} {} {}:', value(group.name),
+                                  group.op, group.value).__enter__()
         elif isinstance(group, list):
-            gen.writeln('_.writefmt({!r}, {})',
+            gen.writeln('{}.writefmt({!r}, {})', target,
                         ''.join(x.builtin_fmt for x in group),
-                        ','.join(x.name for x in group))
+                        ', '.join(value(x.name) for x in group))
         else:
             group: parser.ArgDefinition = group
-            name = group.name
+            name = value(group.name)
             optional = gen.empty().__enter__()
             if group.optional:
                 with gen.block('if {} is None:', name):
-                    gen.writeln("_.writefmt('?', False)")
+                    gen.writeln("{}.writefmt('?', False)", target)
                 optional = gen.block('else:').__enter__()
-                gen.writeln("_.writefmt('?', True)")
+                gen.writeln("{}.writefmt('?', True)", target)
 
             vector = gen.empty().__enter__()
             if group.vec_count_cls:
-                if group.vec_count_cls not in _BUILTIN_CLS:
-                    raise NotImplementedError
+                _generate_write1(gen, target, group.vec_count_cls,
+                                 'len({})'.format(name))
+                if group.cls == 'u8':
+                    # Vectors of u8 are read as byte strings
+                    gen.writeln('{}.write({})', target, name)
+                    optional.__exit__()
+                    continue
 
-                gen.writeln('_.write{}(len({}))', group.vec_count_cls, name)
-                vector = gen.block('for _x in {}:', group.name).__enter__()
+                vector = gen.block('for _x in {}:', name).__enter__()
                 name = '_x'
 
-            if group.builtin_fmt:
-                gen.writeln('_.writefmt({!r}, {})', group.builtin_fmt, name)
-            elif group.cls in _BUILTIN_CLS:
-                gen.writeln('_.write{}({})', group.cls, name)
-            else:
-                raise NotImplementedError
-
+            _generate_write1(gen, target, group.cls, name,
+                             [value(arg) for arg in group.args])
             vector.__exit__()
             optional.__exit__()
     condition.__exit__()
 
 
+def _generate_write1(gen, target, cls, name, args=()):
+    """
+    Helper to write one and only one item for the desired class.
+    """
+    if cls in parser.TYPE_TO_FMT:
+        gen.writeln('{}.writefmt({!r}, {})',
+                    target, parser.TYPE_TO_FMT[cls], name)
+    elif cls in _BUILTIN_CLS:
+        gen.writeln('{}.write{}({})', target, cls, name)
+    else:
+        gen.writeln('{}.write({})', name, ', '.join((target, *args)))
+
+
 def _collapse_args(args):
     """
     This method collapses raw (or bare) types into a single fmt call.
@@ -1,3 +1,10 @@
-from . import utils, datatypes, mojang, network
-from .datatypes import types
+from . import utils, datatypes, mojang, navigation, network, protocols
 from .network import Client
+
+
+def __getattr__(name):
+    if name == 'types':
+        return datatypes.types
+
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__, name))
@@ -1,14 +1,31 @@
 """
-This package contains the client-bound generated server `types`,
-as well as some basic types such as `nbt`, `World`, etc.
+This package contains some basic types such as `nbt`, `World`, etc.,
+as well as the generated client-bound server `types` and server-bound
+ones in `serverbound` (sent by the `Requester`) of the default protocol
+(see `mibomi.protocols` for the rest), only imported when accessed.
 
 In addition, it contains the `DataRW`, used nearly everywhere
 to serialize and deserialize all variety of types into the
-binary format used by the protocol in an efficient way.
+binary format used by the protocol in an efficient way, the
+`DataReader`, which deserializes received packets without
+copying their data first, and the `DataWriter`, which does
+the same when serializing packets to be sent.
 """
-from . import enums, nbt, types
+from . import blocks, enums, nbt
 from .basic import Position, Rotation, Slot
 from .datarw import DataRW
+from .datareader import DataReader
+from .datawriter import DataWriter
+from .vector import StructVector
 from .chunk import Chunk
-from .world import World
+from .world import World, PENDING
 from .entities import Entities
+
+
+def __getattr__(name):
+    if name in ('types', 'serverbound'):
+        from .. import protocols
+        return getattr(protocols.load(), name)
+
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__, name))
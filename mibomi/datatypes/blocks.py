@@ -0,0 +1,60 @@
+"""
+This module contains what is known about the blocks themselves,
+by their block ID (as returned by `Chunk.get_block_id`).
+"""
+
+AIR = 0
+
+# Blocks that can be walked through.
+NON_SOLID = frozenset({
+    0,  # air
+    6,  # sapling
+    8, 9,  # water
+    10, 11,  # lava
+    27, 28,  # powered and detector rails
+    30,  # cobweb
+    31, 32,  # tall grass and dead bush
+    37, 38, 39, 40,  # flowers and mushrooms
+    50, 51,  # torch and fire
+    55,  # redstone wire
+    59,  # wheat
+    63,  # standing sign
+    65, 66,  # ladder and rail
+    68, 69, 70, 72,  # wall sign, lever and pressure plates
+    75, 76, 77,  # redstone torches and stone button
+    78,  # snow layer
+    83,  # sugar cane
+    90,  # nether portal
+    104, 105, 106,  # stems and vine
+    115,  # nether wart
+    119,  # end portal
+    131, 132,  # tripwire hook and tripwire
+    141, 142, 143,  # carrots, potatoes and wooden button
+    147, 148,  # weighted pressure plates
+    157,  # activator rail
+    171,  # carpet
+    175, 176, 177,  # double plant and banners
+    207,  # beetroots
+    209,  # end gateway
+    217,  # structure void
+})
+
+# Blocks that are liquids, through which bots would rather not walk.
+LIQUIDS = frozenset({8, 9, 10, 11})
+
+# Blocks that hurt, trap or teleport whoever touches them.
+DANGEROUS = frozenset({
+    30,  # cobweb
+    51,  # fire
+    81,  # cactus
+    90, 119, 209,  # portals and end gateway
+    213,  # magma block
+})
+
+
+def is_solid(block_id):
+    """
+    Returns whether the block can be stood on, rather than walked
+    through.
+    """
+    return block_id not in NON_SOLID
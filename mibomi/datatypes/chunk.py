@@ -2,27 +2,246 @@
 This module contains basic definitions that
 allow defining and deserialize entire chunk data.
 """
-from . import datarw
+import array
+import collections
+import struct
+import sys
+
+from . import blocks, datareader
 
 CHUNK_HEIGHT = 256
 SECTION_WIDTH = 16
 SECTION_HEIGHT = 16
 SECTION_SIZE = SECTION_WIDTH * SECTION_HEIGHT * SECTION_WIDTH
 
+# Whether sections are decoded with NumPy when it's installed.
+USE_NUMPY = True
+
+_LONG = struct.Struct('>Q')
+
+_uniform = {}  # (length, byte): shared bytes with only that byte
+
+_numpy = None  # imported on first use, or False if it's not installed
+_bit_indices = {}  # bits per block: where the bits of every block are
+_solid = None  # NumPy array telling if every block is solid, made on use
+
 
-def _get_palette_map(data, bits_per_block):
+def _read_palette(data, bits_per_block):
     """
-    Retrieve the appropriated block palette based on the bits per block
-    as a mapping function ``f(palette index) -> block index``.
+    Reads the block palette based on the bits per block as a list
+    ``[palette index] -> block index``, or ``None`` if the palette
+    indices are the block indices themselves.
     """
     if bits_per_block > 8:
         data.readvari32()  # Direct palette stub
-        return lambda x: x
+        return None
     else:
         # Indirect palette is a vari32 and N vari32 block IDs
         # TODO This will change in 1.13.
         return [Chunk.get_block_id(data.readvari32())
-                for _ in range(data.readvari32())].__getitem__
+                for _ in range(data.readvari32())]
+
+
+def _intern(data):
+    """
+    Returns a shared object equal to the `bytes` if all of them are
+    the same (such as the longs of a section made of a single block,
+    or light data without any light), or the `data` itself otherwise.
+
+    The returned object must be copied before modifying it.
+    """
+    if not data:
+        return data
+
+    key = len(data), data[0]
+    shared = _uniform.get(key)
+    if shared is None:
+        if data.count(data[:1]) != len(data):
+            return data
+        shared = _uniform[key] = data
+    elif shared != data:
+        return data
+
+    return shared
+
+
+def _sizeof(data):
+    """
+    Returns the bytes used by the data, or 0 if it's shared (see `_intern`).
+    """
+    if data is None or (data and _uniform.get((len(data), data[0])) is data):
+        return 0
+    return sys.getsizeof(data)
+
+
+def _get_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy
+
+
+def numpy_or_none():
+    """
+    Returns the `numpy` module if it's installed and `USE_NUMPY` is set,
+    or ``None`` if the code without NumPy should be used instead.
+    """
+    return (_get_numpy() or None) if USE_NUMPY else None
+
+
+def _unpack_blocks(longs, bpb, palette):
+    """
+    Unpacks the `SECTION_SIZE` palette indices of `bpb` bits from the
+    big-endian unsigned longs in `longs`, and maps them through the
+    `palette` (if any), returning an ``array('H')`` with the blocks.
+    """
+    numpy = numpy_or_none()
+    if numpy:
+        return _unpack_blocks_numpy(numpy, longs, bpb, palette)
+    else:
+        return _unpack_blocks_loop(longs, bpb, palette)
+
+
+def _unpack_blocks_loop(longs, bpb, palette):
+    # It's VERY important that we read UNSIGNED.
+    #
+    # We want to work with the BITS and shift BITS alone;
+    # shifting negative integers in Python, where the numbers
+    # have no bounded size, produces strange results; this
+    # took a few hours to debug and obviously fails "randomly".
+    #
+    # Note that the bits are read from *low to high* in chunks
+    # of *long values*. For this reason we have an integer with
+    # an amount of bits, and every time we need more bits, read
+    # another long worth of bits.
+    #
+    # This is a very tight loop, and iter() + next() seems to
+    # play best, as well as avoiding .append() calls, pre-allocating
+    # enough block IDs, a simple mapping function for the palette.
+    palette = palette.__getitem__ if palette is not None else int
+    bits = 0
+    integer = 0
+    mask = (1 << bpb) - 1
+    block_ids = array.array('H', bytes(2 * SECTION_SIZE))
+    longs = iter(datareader.DataReader(longs).readfmt(
+        'Q' * (len(longs) // 8)))
+    for i in range(SECTION_SIZE):
+        if bits < bpb:
+            integer |= next(longs) << bits
+            bits += 64
+
+        block_ids[i] = palette(integer & mask)
+        integer >>= bpb
+        bits -= bpb
+
+    return block_ids
+
+
+def _unpack_blocks_numpy(numpy, longs, bpb, palette):
+    indices = _bit_indices.get(bpb)
+    if indices is None:
+        bit = numpy.arange(SECTION_SIZE, dtype=numpy.uint64)
+        bit *= numpy.uint64(bpb)
+        offset = bit & numpy.uint64(63)
+        # Blocks that don't fit in what's left of their long take
+        # the rest of their bits from the low end of the next one
+        straddle = numpy.flatnonzero(offset + numpy.uint64(bpb) > 64)
+        indices = _bit_indices[bpb] = (
+            (bit >> numpy.uint64(6)).astype(numpy.intp), offset, straddle,
+            numpy.uint64(64) - offset[straddle]
+        )
+
+    index, offset, straddle, shift = indices
+    words = numpy.frombuffer(longs, '>u8').astype(numpy.uint64)
+    values = words[index] >> offset
+    values[straddle] |= words[index[straddle] + 1] << shift
+    values &= numpy.uint64((1 << bpb) - 1)
+    if palette is not None:
+        values = numpy.array(palette, numpy.uint16)[values.astype(numpy.intp)]
+    return array.array('H', values.astype(numpy.uint16).tobytes())
+
+
+def _count_blocks(values):
+    """
+    Returns how many of each block there are in the ``array('H')``
+    as a dictionary ``{block: count}``.
+    """
+    numpy = numpy_or_none()
+    if numpy:
+        unique, counts = numpy.unique(
+            numpy.frombuffer(values, numpy.uint16), return_counts=True)
+        return dict(zip(unique.tolist(), counts.tolist()))
+    else:
+        return dict(collections.Counter(values))
+
+
+def _get_solid(numpy):
+    global _solid
+    if _solid is None:
+        _solid = numpy.ones(1 << 16, bool)
+        _solid[list(blocks.NON_SOLID)] = False
+    return _solid
+
+
+def _has_solid(section):
+    """
+    Returns whether the section may have any solid block.
+    """
+    return section is not None and (
+        section._palette is None
+        or not blocks.NON_SOLID.issuperset(section._palette))
+
+
+def _pack_blocks(indices, bpb):
+    """
+    Packs the palette indices into `bpb` bits each, as big-endian
+    unsigned longs, the opposite of `_unpack_blocks` (without palette).
+    """
+    longs = []
+    bits = 0
+    integer = 0
+    for index in indices:
+        integer |= index << bits
+        bits += bpb
+        if bits >= 64:
+            longs.append(integer & 0xffffffffffffffff)
+            integer >>= 64
+            bits -= 64
+
+    if bits:
+        longs.append(integer)
+
+    return bytearray(struct.pack('>{}Q'.format(len(longs)), *longs))
+
+
+def read_sections(data, bit_mask, new_chunk, over_world=True):
+    """
+    Reads the sections and biome information (if it's a `new_chunk`)
+    out of the data of a chunk, as ``(sections, biome_info)``.
+
+    Since nothing else is needed, and the result can be pickled, it
+    may be done in another thread or process, and then given to the
+    `Chunk` along with the rest of the chunk.
+    """
+    data = datareader.DataReader(data)
+    sections = []
+    for section_y in range(CHUNK_HEIGHT // SECTION_HEIGHT):
+        if bit_mask & (1 << section_y):
+            sections.append(Section(data, over_world))
+        else:
+            sections.append(None)
+
+    if new_chunk:
+        biome_info = BiomeInfo(data)
+    else:
+        biome_info = None
+
+    assert not data.read()
+    return sections, biome_info
 
 
 class Chunk:
@@ -36,26 +255,44 @@ class Chunk:
 
     In addition, it has its `x` and `y` positions, the
     `entities` in the chunk, all its `sections` and
-    `biome_info`.
+    `biome_info`. Sections that were not sent are ``None``,
+    until a block other than air is written into them.
+
+    If the data of the chunk was already `decoded` with
+    `read_sections`, it is used instead of reading it again.
+
+    The height of the highest solid block in every column is
+    given by `height_at`, made the first time it's needed from
+    the sections that have some, and kept up to date from then on.
+
+    If `on_cache` is set, it's called with the amount of bytes used
+    by the caches built while reading the chunk or its sections (see
+    `memory`), and it's set for the sections as well.
     """
-    def __init__(self, chunk, over_world=True):
-        data = datarw.DataRW(chunk.data)
+    def __init__(self, chunk, over_world=True, decoded=None):
+        self.over_world = over_world
         self.x = chunk.x
         self.z = chunk.z
         self.entities = chunk.block_entities
-        self.sections = []
-        for section_y in range(CHUNK_HEIGHT // SECTION_HEIGHT):
-            if chunk.bit_mask & (1 << section_y):
-                self.sections.append(Section(data, over_world))
-            else:
-                self.sections.append(None)
-
-        if chunk.new_chunk:
-            self.biome_info = BiomeInfo(data)
-        else:
-            self.biome_info = None
-
-        assert not data.read()
+        if decoded is None:
+            decoded = read_sections(
+                chunk.data, chunk.bit_mask, chunk.new_chunk, over_world)
+
+        # Unless read by `read_sections` elsewhere, such as in a pool
+        self.sections, self.biome_info = decoded
+        self._heightmap = None  # array('h') by (z, x), -1 if there's none
+        self._on_cache = None
+
+    @property
+    def on_cache(self):
+        return self._on_cache
+
+    @on_cache.setter
+    def on_cache(self, callback):
+        self._on_cache = callback
+        for section in self.sections:
+            if section is not None:
+                section.on_cache = callback
 
     @staticmethod
     def get_block_id(n):
@@ -76,10 +313,103 @@ class Chunk:
     def __setitem__(self, xyz, value):
         x, y, z = xyz
         yh, yl = divmod(y, 16)
-        if self.sections[yh]:
-            self.sections[yh][x, yl, z] = value
-        else:
-            raise NotImplementedError
+        section = self.sections[yh]
+        if section is None:
+            if not value:
+                return  # Missing sections are already air
+
+            section = self.sections[yh] = Section.uniform(
+                0, self.over_world)
+            section.on_cache = self._on_cache
+
+        section[x, yl, z] = value
+        if self._heightmap is not None:
+            i = z * SECTION_WIDTH + x
+            if y > self._heightmap[i] and blocks.is_solid(value):
+                self._heightmap[i] = y
+            elif y == self._heightmap[i] and not blocks.is_solid(value):
+                self._heightmap[i] = self._find_height(x, z, y - 1)
+
+    def height_at(self, x, z):
+        """
+        Returns the height of the highest solid block in the column,
+        or ``None`` if there's none.
+        """
+        if self._heightmap is None:
+            self._heightmap = self._build_heightmap()
+            if self._on_cache is not None:
+                self._on_cache(sys.getsizeof(self._heightmap))
+        y = self._heightmap[z * SECTION_WIDTH + x]
+        return None if y < 0 else y
+
+    def _find_height(self, x, z, top):
+        """
+        Returns the height of the highest solid block in the column
+        from `top` downwards, or -1 if there's none.
+        """
+        y = top
+        while y >= 0:
+            section = self.sections[y // SECTION_HEIGHT]
+            if not _has_solid(section):
+                y -= y % SECTION_HEIGHT + 1  # Skip the rest of the section
+            elif blocks.is_solid(section[x, y % SECTION_HEIGHT, z]):
+                return y
+            else:
+                y -= 1
+        return -1
+
+    def _build_heightmap(self):
+        """
+        Finds the height of every column, from the highest section down
+        until they're all known, skipping those without solid blocks.
+        """
+        columns = SECTION_WIDTH * SECTION_WIDTH
+        heights = array.array('h', [-1]) * columns
+        left = columns
+        numpy = numpy_or_none()
+        for section_y in reversed(range(len(self.sections))):
+            section = self.sections[section_y]
+            if not _has_solid(section):
+                continue
+
+            section_blocks = section.get_blocks()
+            if numpy:
+                solid = _get_solid(numpy)[numpy.frombuffer(
+                    section_blocks, numpy.uint16)].reshape(-1, columns)
+                # The first solid block found from the top of each column
+                top = len(solid) - 1 - solid[::-1].argmax(axis=0)
+                found = solid.any(axis=0)
+                current = numpy.frombuffer(heights, numpy.int16)
+                new = found & (current < 0)
+                current[new] = section_y * SECTION_HEIGHT + top[new]
+                left -= int(new.sum())
+            else:
+                for i in range(columns):
+                    if heights[i] >= 0:
+                        continue
+                    for y in reversed(range(SECTION_HEIGHT)):
+                        if section_blocks[y * columns + i] \
+                                not in blocks.NON_SOLID:
+                            heights[i] = section_y * SECTION_HEIGHT + y
+                            left -= 1
+                            break
+
+            if not left:
+                break
+
+        return heights
+
+    @property
+    def memory(self):
+        """
+        Approximate amount of bytes used by the chunk, besides any data
+        shared with others.
+        """
+        size = sys.getsizeof(self) + sys.getsizeof(self.sections) + sum(
+            section.memory for section in self.sections if section)
+        if self._heightmap is not None:
+            size += sys.getsizeof(self._heightmap)
+        return size
 
 
 class Section:
@@ -88,86 +418,295 @@ class Section:
     usage is access similar to how the chunk data is
     accessed.
 
-    Sections have `light` and `sky_light` data.
+    The blocks are kept packed as they were received, as indices
+    into the palette with the same bits per block, and read straight
+    from there. Writing a block that's not in the palette adds it,
+    using one more bit per block if it's full. Once more than 8 bits
+    would be needed, all of them are unpacked into a flat ``array('H')``
+    (see `unpacked`) instead.
+
+    Sections made of a single block share their packed data with all
+    others like them, until a block is written (see `uniform`).
+
+    Which blocks a section has may be checked with `contains`, often
+    from the palette alone, or else by counting them once, which are
+    kept up to date from then on (see `get_counts`).
+
+    Sections have `light` and `sky_light` data, and may have an
+    `on_cache` callback like `Chunk`.
     """
     def __init__(self, data, over_world):
         bpb = data.read(1)[0]  # bits per block
-        palette = _get_palette_map(data, bpb)
+        self._bits_per_block = bpb
+        self._palette = _read_palette(data, bpb)
+        self._index = None  # {block: palette index}, made when writing
+        self._mask = (1 << bpb) - 1
 
         length = data.readvari32()
         assert (length * 64) // bpb >= SECTION_SIZE
-        # It's VERY important that we read UNSIGNED.
-        #
-        # We want to work with the BITS and shift BITS alone;
-        # shifting negative integers in Python, where the numbers
-        # have no bounded size, produces strange results; this
-        # took a few hours to debug and obviously fails "randomly".
-        #
-        # Note that the bits are read from *low to high* in chunks
-        # of *long values*. For this reason we have an integer with
-        # an amount of bits, and every time we need more bits, read
-        # another long worth of bits.
-        #
-        # This is a very tight loop, and iter() + next() seems to
-        # play best, as well as avoiding .append() calls, pre-allocating
-        # enough block IDs, a simple mapping function for the palette.
-        bits = 0
-        integer = 0
-        mask = (1 << bpb) - 1
-        block_ids = [0] * SECTION_SIZE
-        longs = iter(data.readfmt('Q' * length))
-        for i in range(SECTION_SIZE):
-            if bits < bpb:
-                integer |= next(longs) << bits
-                bits += 64
-
-            block_ids[i] = palette(integer & mask)
-            integer >>= bpb
-            bits -= bpb
-
-        self._blocks = block_ids
+        # Shared if all the indices are 0, and a bytearray once written
+        self._longs = _intern(data.read(length * 8))
+        self._blocks = None
+        self._counts = None  # {block: count}, made when needed
+        self._classified = None  # (table, classes), until a block is written
+        self.on_cache = None
         self.light = LightData(data)
         if over_world:
             self.sky_light = LightData(data)
         else:
             self.sky_light = None
 
+    @classmethod
+    def uniform(cls, block=0, over_world=True):
+        """
+        Creates a section made only of the given block, without any
+        block light, and with full sky light if it's `over_world`.
+        """
+        self = cls.__new__(cls)
+        self._bits_per_block = 4  # the least used by the server
+        self._palette = [block]
+        self._index = None
+        self._mask = 0xf
+        self._longs = _intern(bytes(4 * SECTION_SIZE // 8))
+        self._blocks = None
+        self._counts = None
+        self._classified = None
+        self.on_cache = None
+        self.light = LightData.uniform(0)
+        if over_world:
+            self.sky_light = LightData.uniform(15)
+        else:
+            self.sky_light = None
+        return self
+
+    def __setstate__(self, state):
+        # Data shared before pickling should be shared again
+        if isinstance(state['_longs'], bytes):
+            state['_longs'] = _intern(state['_longs'])
+        self.__dict__.update(state)
+
+    def copy(self):
+        """
+        Returns a copy of the section whose blocks don't change when
+        they're written into this one, such as to read them from another
+        thread. Data that is never modified in place is shared, but so
+        is the light data.
+        """
+        section = Section.__new__(Section)
+        section.__dict__.update(self.__dict__)
+        if isinstance(self._longs, bytearray):
+            section._longs = bytes(self._longs)
+        if self._palette is not None:
+            section._palette = list(self._palette)
+        if self._blocks is not None:
+            section._blocks = array.array('H', self._blocks)
+        if self._counts is not None:
+            section._counts = dict(self._counts)
+        section._index = None
+        section.on_cache = None
+        return section
+
+    @property
+    def unpacked(self):
+        """
+        Whether the blocks have been unpacked into a flat array.
+        """
+        return self._blocks is not None
+
+    def get_blocks(self):
+        """
+        Returns all the blocks as a flat ``array('H')``, indexed by
+        ``(y * 16 + z) * 16 + x``. It's a copy unless it's `unpacked`,
+        in which case it must not be modified.
+        """
+        if self._blocks is not None:
+            return self._blocks
+        if len(self._palette or ()) == 1:
+            return array.array('H', self._palette) * SECTION_SIZE
+        return _unpack_blocks(self._longs, self._bits_per_block,
+                              self._palette)
+
+    @property
+    def memory(self):
+        """
+        Approximate amount of bytes used by the section, besides any data
+        shared with others.
+        """
+        size = sys.getsizeof(self) + _sizeof(self._longs) + \
+            _sizeof(self._blocks) + self.light.memory
+        if self._palette is not None:
+            size += sys.getsizeof(self._palette)
+        if self._index is not None:
+            size += sys.getsizeof(self._index)
+        if self._counts is not None:
+            size += sys.getsizeof(self._counts)
+        if self._classified is not None:
+            size += _sizeof(self._classified[1])
+        if self.sky_light is not None:
+            size += self.sky_light.memory
+        return size
+
     def __getitem__(self, xyz):
         x, y, z = xyz
-        return self._blocks[(y * SECTION_HEIGHT + z) * SECTION_WIDTH + x]
+        i = (y * SECTION_HEIGHT + z) * SECTION_WIDTH + x
+        if self._blocks is not None:
+            return self._blocks[i]
+
+        # We want the i'th block at the right bit index.
+        # Each long is 64 bits; get long index + offset.
+        bpb = self._bits_per_block
+        i, o = divmod(bpb * i, 64)
+        r = _LONG.unpack_from(self._longs, i * 8)[0] >> o
+        if o + bpb > 64:
+            # We have some missing bits from the next long
+            r |= _LONG.unpack_from(self._longs, i * 8 + 8)[0] << (64 - o)
+
+        r &= self._mask
+        return r if self._palette is None else self._palette[r]
+
+    def get_counts(self):
+        """
+        Returns how many of each block there are in the section, as a
+        dictionary ``{block: count}`` that must not be modified.
+        """
+        if self._counts is None:
+            if len(self._palette or ()) == 1:
+                self._counts = {self._palette[0]: SECTION_SIZE}
+            else:
+                self._counts = _count_blocks(self.get_blocks())
+            if self.on_cache is not None:
+                self.on_cache(sys.getsizeof(self._counts))
+        return self._counts
+
+    def classify(self, table):
+        """
+        Returns the blocks mapped through the `table` (a `bytes` object
+        with a value for every possible block), such as to tell which ones
+        can be walked through, as `bytes` in the same order as `get_blocks`.
+
+        The result is cached until a block is written.
+        """
+        if self._classified is not None and self._classified[0] is table:
+            return self._classified[1]
+
+        if len(self._palette or ()) == 1:
+            classes = bytes((table[self._palette[0]],)) * SECTION_SIZE
+        else:
+            numpy = numpy_or_none()
+            if numpy:
+                classes = numpy.frombuffer(table, numpy.uint8)[
+                    numpy.frombuffer(self.get_blocks(), numpy.uint16)
+                ].tobytes()
+            else:
+                classes = bytes(map(table.__getitem__, self.get_blocks()))
+
+        classes = _intern(classes)
+        if self.on_cache is not None:
+            self.on_cache(_sizeof(classes) - (
+                _sizeof(self._classified[1]) if self._classified else 0))
+        self._classified = table, classes
+        return classes
+
+    def contains(self, block_ids):
+        """
+        Returns whether any of the blocks in the set `block_ids`
+        is in the section.
+        """
+        if self._palette is not None and block_ids.isdisjoint(self._palette):
+            return False  # The palette may have more, but never less
+        return not block_ids.isdisjoint(self.get_counts())
 
     def __setitem__(self, xyz, value):
         x, y, z = xyz
-        self._blocks[(y * SECTION_HEIGHT + z) * SECTION_WIDTH + x] = value
+        i = (y * SECTION_HEIGHT + z) * SECTION_WIDTH + x
+        self._classified = None
+        counts = self._counts
+        if counts is not None:
+            old = self[xyz]
+            if old == value:
+                return
+            if counts[old] == 1:
+                del counts[old]
+            else:
+                counts[old] -= 1
+            counts[value] = counts.get(value, 0) + 1
 
+        if self._blocks is None:
+            index = self._palette_index(value)
+            if index is not None:
+                self._set_index(i, index)
+                return
 
-"""
-A way to access palette indices straight from the array of longs:
-
-def get_index(xyz):
-    x, y, z = xyz
-    bpb = self._bits_per_block
-    # We want the i'th block at the right bit index.
-    # Each long is 64 bits; return long index + offset.
-    i, o = divmod(
-        bpb * ((y * SECTION_HEIGHT + z) * SECTION_WIDTH + x),
-        64
-    )
-    # Retrieve the correct long Result and shift it by Offset
-    r = self._longs[i] >> o
-    if o + bpb > 64:
-        # We have some Missing bits from the next long
-        m = (o + bpb) - 64
-        m = self._longs[i + 1] & ((1 << m) - 1)
-        r |= m << (bpb - o)
-
-    return self._palette[r & self._mask]
-
-The problem with this approach is that, when a block needs to
-be updated ((over)written), it would need to be looked up in
-the palette, which may or may not have the block and may or
-may not need resizing, so it's only suitable for reading.
-"""
+        self._blocks[i] = value
+
+    def _palette_index(self, value):
+        """
+        Returns the palette index for the block, adding it to the
+        palette if needed, or ``None`` if the blocks were unpacked
+        because it does not fit.
+        """
+        if self._palette is None:
+            if value <= self._mask:
+                return value  # The indices are the blocks themselves
+        else:
+            if self._index is None:
+                self._index = {block: index for index, block
+                               in reversed(list(enumerate(self._palette)))}
+
+            index = self._index.get(value)
+            if index is not None:
+                return index
+
+            if len(self._palette) > self._mask:
+                if self._bits_per_block == 8:
+                    self._unpack()
+                    return None
+                self._repack(self._bits_per_block + 1)
+
+            index = self._index[value] = len(self._palette)
+            self._palette.append(value)
+            return index
+
+        self._unpack()
+        return None
+
+    def _set_index(self, i, index):
+        """
+        Overwrites the palette index of the i'th block.
+        """
+        if not isinstance(self._longs, bytearray):
+            self._longs = bytearray(self._longs)
+
+        bpb = self._bits_per_block
+        i, o = divmod(bpb * i, 64)
+        r = _LONG.unpack_from(self._longs, i * 8)[0]
+        r &= ~(self._mask << o) & 0xffffffffffffffff
+        r |= (index << o) & 0xffffffffffffffff
+        _LONG.pack_into(self._longs, i * 8, r)
+        if o + bpb > 64:
+            # The rest of bits go at the start of the next long
+            r = _LONG.unpack_from(self._longs, i * 8 + 8)[0]
+            r &= ~(self._mask >> (64 - o))
+            r |= index >> (64 - o)
+            _LONG.pack_into(self._longs, i * 8 + 8, r)
+
+    def _repack(self, bpb):
+        """
+        Packs the palette indices again with the given bits per block.
+        """
+        indices = _unpack_blocks(self._longs, self._bits_per_block, None)
+        self._longs = _pack_blocks(indices, bpb)
+        self._bits_per_block = bpb
+        self._mask = (1 << bpb) - 1
+
+    def _unpack(self):
+        """
+        Unpacks all the blocks into a flat array, which is updated
+        in place from then on.
+        """
+        self._blocks = _unpack_blocks(
+            self._longs, self._bits_per_block, self._palette)
+        self._longs = self._palette = self._index = None
 
 
 class LightData:
@@ -176,20 +715,46 @@ class LightData:
     """
     def __init__(self, data):
         length = SECTION_HEIGHT * SECTION_WIDTH * SECTION_WIDTH // 2
-        self._data = bytearray(data.read(length))
+        # Shared if it's all the same light, and a bytearray once written
+        self._data = _intern(data.read(length))
         assert len(self._data) == length
 
+    def __setstate__(self, state):
+        if isinstance(state['_data'], bytes):
+            state['_data'] = _intern(state['_data'])
+        self.__dict__.update(state)
+
+    @classmethod
+    def uniform(cls, level):
+        """
+        Creates light data with the same light level everywhere.
+        """
+        length = SECTION_HEIGHT * SECTION_WIDTH * SECTION_WIDTH // 2
+        self = cls.__new__(cls)
+        self._data = _intern(bytes((level * 0x11,)) * length)
+        return self
+
+    @property
+    def memory(self):
+        """
+        Approximate amount of bytes used, unless the data is shared.
+        """
+        return sys.getsizeof(self) + _sizeof(self._data)
+
     # TODO This requires more testing
     def __getitem__(self, xyz):
         x, y, z = xyz
-        i = self._data[(y * SECTION_HEIGHT + z) * SECTION_WIDTH + x // 2]
+        i = self._data[((y * SECTION_HEIGHT + z) * SECTION_WIDTH + x) // 2]
         if x & 1:
             i >>= 4  # odd, use higher bits
         return i & 0x0f
 
     def __setitem__(self, xyz, value):
         x, y, z = xyz
-        i = (y * SECTION_HEIGHT + z) * SECTION_WIDTH + x // 2
+        if not isinstance(self._data, bytearray):
+            self._data = bytearray(self._data)
+
+        i = ((y * SECTION_HEIGHT + z) * SECTION_WIDTH + x) // 2
         j = self._data[i]
         if x & 1:
             j &= 0x0f
@@ -0,0 +1,175 @@
+import struct
+import uuid
+
+
+from .basic import Position, Slot
+from .datarw import DataRW
+from . import nbt
+
+# Every format used so far, compiled only the first time it's needed
+_STRUCTS = {}
+
+_SHORT = struct.Struct('>h')
+_POS = struct.Struct('>Q')
+
+
+def _compile(fmt):
+    s = _STRUCTS[fmt] = struct.Struct('>' + fmt)
+    return s
+
+
+# noinspection SpellCheckingInspection
+class DataReader:
+    """
+    Fast Data Reader to deserialize binary data held in `bytes`,
+    a `bytearray` or a `memoryview`, without copying it first.
+
+    It offers the same ``read*`` methods as `DataRW`, but rather
+    than going through a stream, it keeps track of the `offset`
+    into the `buffer` and unpacks values straight from there.
+    """
+    __slots__ = ('buffer', 'offset')
+
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def read(self, n=-1):
+        """
+        Reads at most `n` bytes, or all the remaining data if negative.
+        """
+        start = self.offset
+        end = len(self.buffer)
+        if 0 <= n < end - start:
+            end = start + n
+
+        self.offset = end
+        return bytes(self.buffer[start:end])
+
+    def readexactly(self, n):
+        """
+        Reads exactly `n` bytes, such as those of a length-prefixed value,
+        raising `ValueError` if the length is negative or too large.
+        """
+        start = self.offset
+        end = start + n
+        if n < 0 or end > len(self.buffer):
+            raise ValueError('length {} does not fit in the data'.format(n))
+
+        self.offset = end
+        return bytes(self.buffer[start:end])
+
+    def readfmt(self, fmt):
+        """
+        Reads a tuple with the given format.
+        """
+        s = _STRUCTS.get(fmt) or _compile(fmt)
+        values = s.unpack_from(self.buffer, self.offset)
+        self.offset += s.size
+        return values
+
+    def readstr(self):
+        """
+        Reads a text string of data.
+        """
+        n = self.readvari32()
+        if n < 0:
+            raise ValueError('length {} does not fit in the data'.format(n))
+        start = self.offset
+        self.offset += n
+        return str(self.buffer[start:self.offset], 'utf-8')
+
+    def readbytes(self):
+        """
+        Reads the remaining byte string of data.
+        """
+        return self.read()
+
+    def readvari32(self):
+        """
+        Reads a variable-length integer of, at most, 32 bits.
+        """
+        buffer = self.buffer
+        i = self.offset
+        value = buffer[i]
+        i += 1
+        if value & 0x80:
+            value &= 0x7f
+            shift = 7
+            while True:
+                byte = buffer[i]
+                i += 1
+                value |= (byte & 0x7f) << shift
+                if not (byte & 0x80):
+                    break
+                shift += 7
+                if shift == 35:
+                    raise ValueError('variable length integer is too long')
+
+            if value > 0x7fffffff:
+                value -= 1 << 32
+
+        self.offset = i
+        return value
+
+    def readvari64(self):
+        """
+        Reads a variable-length integer of, at most, 64 bits.
+        """
+        buffer = self.buffer
+        i = self.offset
+        value = 0
+        shift = 0
+        while True:
+            byte = buffer[i]
+            i += 1
+            value |= (byte & 0x7f) << shift
+            if not (byte & 0x80):
+                break
+            shift += 7
+            if shift == 70:
+                raise ValueError('variable length integer is too long')
+
+        if value > 0x7fffffffffffffff:
+            value -= 1 << 64
+
+        self.offset = i
+        return value
+
+    def readpos(self):
+        """
+        Reads a position, and returns a tuple of ``(x, y, z)``.
+        """
+        (value,) = _POS.unpack_from(self.buffer, self.offset)
+        self.offset += 8
+        x = (value >> 38) & 0x3ffffff
+        y = (value >> 26) & 0xfff
+        z = (value >>  0) & 0x3ffffff
+        if x >= (1 << 25):
+            x -= 1 << 26
+        if y >= (1 << 11):
+            y -= 1 << 12
+        if z >= (1 << 25):
+            z -= 1 << 26
+        return Position(x, y, z)
+
+    def readuuid(self):
+        return uuid.UUID(bytes=self.read(16))
+
+    def readleft(self):
+        return self.read()
+
+    def readnbt(self):
+        return nbt.BaseTag.read(self)
+
+    def readslot(self):
+        (block_id,) = _SHORT.unpack_from(self.buffer, self.offset)
+        self.offset += 2
+        if block_id == -1:
+            return
+
+        count, dmg = self.readfmt('bh')
+        return Slot(block_id, count, dmg, self.readnbt())
+
+    # These only rely on the methods above, so they can be shared as-is
+    readentmeta = DataRW.readentmeta
@@ -208,8 +208,53 @@ class DataRW(io.BytesIO):
                 raise ValueError('invalid entmeta type {}'.format(cls))
             result.append((index, value))
 
-    def writeentmeta(self, value):
-        raise NotImplementedError
+    def writeentmeta(self, entries):
+        """
+        Writes entity metadata, as a list of ``(index, value)`` or
+        ``(index, type, value)`` tuples. Without the type, it's guessed
+        from the value, so entries of types that read back as the same
+        Python values (byte, chat, direction and optionals) need it.
+        """
+        for entry in entries:
+            if len(entry) == 2:
+                index, value = entry
+                cls = _entmeta_type(value)
+            else:
+                index, cls, value = entry
+
+            self.writefmt('B', index)
+            self.writevari32(cls)
+            if cls == 0:
+                self.writefmt('B', value)
+            elif cls == 1 or cls == 10:
+                self.writevari32(value)
+            elif cls == 2:
+                self.writefmt('f', value)
+            elif cls == 3 or cls == 4:
+                self.writestr(value)
+            elif cls == 5:
+                self.writeslot(value)
+            elif cls == 6:
+                self.writefmt('?', value)
+            elif cls == 7:
+                self.writefmt('fff', *value)
+            elif cls == 8:
+                self.writepos(value)
+            elif cls in (9, 11, 12):
+                self.writefmt('?', value is not None)
+                if value is not None:
+                    if cls == 9:
+                        self.writepos(value)
+                    elif cls == 11:
+                        self.writeuuid(value)
+                    else:
+                        self.writevari32(value)
+            elif cls == 13:
+                self.writenbt(value)
+            else:
+                raise ValueError('invalid entmeta type {}'.format(cls))
+
+        self.writefmt('B', 0xff)
 
     def readnbt(self):
         return nbt.read(self)
@@ -232,4 +277,33 @@ class DataRW(io.BytesIO):
 
         block_id, count, dmg, nbt = value
         self.writefmt('hbh', block_id, count, dmg)
-        self.writenbt(value)
+        if nbt is None:
+            self.write(b'\0')  # TagEnd, no NBT data
+        else:
+            self.writenbt(nbt)
+
+
+def _entmeta_type(value):
+    """
+    Guesses the entity metadata type of the given value.
+    """
+    if isinstance(value, bool):
+        return 6
+    elif isinstance(value, int):
+        return 1
+    elif isinstance(value, float):
+        return 2
+    elif isinstance(value, str):
+        return 3
+    elif isinstance(value, Slot):
+        return 5
+    elif isinstance(value, Rotation):
+        return 7
+    elif isinstance(value, Position):
+        return 8
+    elif isinstance(value, uuid.UUID):
+        return 11
+    elif isinstance(value, nbt.BaseTag):
+        return 13
+    else:
+        raise TypeError('cannot guess entmeta type of {!r}'.format(value))
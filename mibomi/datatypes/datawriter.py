@@ -0,0 +1,183 @@
+import struct
+
+
+from . import datareader
+from .datarw import DataRW
+
+# Room reserved in front of the payload for the frame's prefixes,
+# the length and the data length, which take 5 bytes at most each.
+HEADROOM = 10
+
+_STRUCTS = datareader._STRUCTS
+_compile = datareader._compile
+
+_SHORT = struct.Struct('>h')
+_POS = struct.Struct('>Q')
+
+
+# noinspection SpellCheckingInspection
+class DataWriter:
+    """
+    Fast Data Writer to serialize an entire packet into a single buffer.
+
+    It offers the same ``write*`` methods as `DataRW`, but values are
+    packed straight into a `bytearray` that leaves room in front of the
+    payload, so that the frame's length prefixes can be written in place
+    once its size is known, rather than concatenating new `bytes`.
+
+    If a Packet ID is given, it's written as the start of the payload.
+    """
+    __slots__ = ('buffer', 'start', 'offset')
+
+    def __init__(self, pid=None, size=64):
+        self.buffer = bytearray(HEADROOM + size)
+        self.start = HEADROOM
+        self.offset = HEADROOM
+        if pid is not None:
+            self.writevari32(pid)
+
+    def __len__(self):
+        return self.offset - self.start
+
+    def _reserve(self, n):
+        """
+        Makes sure that there is room for `n` more bytes.
+        """
+        missing = self.offset + n - len(self.buffer)
+        if missing > 0:
+            self.buffer.extend(bytes(max(missing, len(self.buffer))))
+
+    def write(self, data):
+        """
+        Writes the given bytes-like object.
+        """
+        end = self.offset + len(data)
+        self.buffer[self.offset:end] = data
+        self.offset = end
+
+    def writefmt(self, fmt, *values):
+        """
+        Writes the given values with the given format.
+        """
+        s = _STRUCTS.get(fmt) or _compile(fmt)
+        end = self.offset + s.size
+        if end > len(self.buffer):
+            self._reserve(s.size)
+        s.pack_into(self.buffer, self.offset, *values)
+        self.offset = end
+
+    def writestr(self, value):
+        """
+        Writes the given text string of data.
+        """
+        value = value.encode('utf-8')
+        self.writevari32(len(value))
+        self.write(value)
+
+    def writebytes(self, value):
+        """
+        Writes the given byte string of data.
+        """
+        self.write(value)
+
+    def writevari32(self, value):
+        """
+        Writes a variable-length integer of at most 32 bits.
+        """
+        self._writevari(value & 0xffffffff)
+
+    def writevari64(self, value):
+        """
+        Writes a variable-length integer of at most 64 bits.
+        """
+        self._writevari(value & 0xffffffffffffffff)
+
+    def _writevari(self, value):
+        if self.offset + 10 > len(self.buffer):
+            self._reserve(10)
+        buffer = self.buffer
+        i = self.offset
+        while value > 0x7f:
+            buffer[i] = (value & 0x7f) | 0x80
+            value >>= 7
+            i += 1
+
+        buffer[i] = value
+        self.offset = i + 1
+
+    def prefix(self, value):
+        """
+        Writes a variable-length integer of at most 32 bits right
+        in front of the data written so far, using the headroom.
+        """
+        if 0 <= value <= 0x7f and self.start:
+            self.start -= 1
+            self.buffer[self.start] = value
+            return
+
+        value &= 0xffffffff
+        size = 1
+        while value >> (7 * size):
+            size += 1
+
+        if size > self.start:
+            raise ValueError('not enough room left to prefix the data')
+
+        self.start -= size
+        buffer = self.buffer
+        for i in range(self.start, self.start + size - 1):
+            buffer[i] = (value & 0x7f) | 0x80
+            value >>= 7
+
+        buffer[self.start + size - 1] = value
+
+    def getvalue(self):
+        """
+        Returns a copy of the data written so far as `bytes`.
+        """
+        return bytes(self.buffer[self.start:self.offset])
+
+    def getbuffer(self):
+        """
+        Returns a `memoryview` over the data written so far.
+        """
+        return memoryview(self.buffer)[self.start:self.offset]
+
+    def writepos(self, xyz):
+        """
+        Writes a position.
+        """
+        x, y, z = xyz
+        self._reserve(8)
+        _POS.pack_into(self.buffer, self.offset, (
+            ((x & 0x3ffffff) << 38) |
+            ((y & 0xfff)     << 26) |
+            ((z & 0x3ffffff) << 0)
+        ))
+        self.offset += 8
+
+    def writeuuid(self, value):
+        self.write(value.bytes)
+
+    def writeleft(self, value):
+        self.write(value)
+
+    def writenbt(self, value):
+        value.write(self)
+
+    def writeslot(self, value):
+        if not value:
+            self._reserve(2)
+            _SHORT.pack_into(self.buffer, self.offset, -1)
+            self.offset += 2
+            return
+
+        block_id, count, dmg, nbt = value
+        self.writefmt('hbh', block_id, count, dmg)
+        if nbt is None:
+            self.write(b'\0')  # TagEnd, no NBT data
+        else:
+            self.writenbt(nbt)
+
+    # These only rely on the methods above, so they can be shared as-is
+    writeentmeta = DataRW.writeentmeta
@@ -0,0 +1,62 @@
+"""
+This module contains the mapping used by the generated modules of
+packet types to create each of their classes the first time they're
+needed, since a client only ever uses a few of them, and creating
+all of them up-front makes importing the library noticeably slower.
+"""
+import collections.abc
+
+
+class LazyTypes(collections.abc.Mapping):
+    """
+    Mapping of ``{Packet ID: class}`` whose classes are created on
+    first access, by calling the ``_make_<class name>`` function in
+    `namespace` (the globals of the generated module), after the
+    classes they `depend` on (``{class name: names}``), if any.
+
+    Created classes are saved into the `namespace`, so that they're
+    found as usual from then on. Its `load` method is meant to be
+    the module's ``__getattr__`` to create the rest on access.
+    """
+    def __init__(self, namespace, classes, depend=None):
+        self._namespace = namespace
+        self._classes = classes
+        self._depend = depend or {}
+        self._loaded = {}
+
+    def __getitem__(self, pid):
+        cls = self._loaded.get(pid)
+        if cls is None:
+            cls = self._loaded[pid] = self.load(self._classes[pid])
+        return cls
+
+    def __contains__(self, pid):
+        return pid in self._classes
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def load(self, name):
+        """
+        Returns the class with the given name, creating it if needed.
+
+        Raises `AttributeError` if there is no such class.
+        """
+        namespace = self._namespace
+        cls = namespace.get(name)
+        if cls is not None:
+            return cls
+
+        make = namespace.get('_make_' + name)
+        if make is None:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(
+                namespace.get('__name__'), name))
+
+        for other in self._depend.get(name, ()):
+            self.load(other)
+
+        # Keep the first one if another thread was creating it meanwhile
+        return namespace.setdefault(name, make())
@@ -242,7 +242,8 @@ class TagIntArray(BaseTag):
     def read(cls, stream, named=True):
         name = named and cls._read_str(stream)
         length = struct.unpack('>i', stream.read(4))[0]
-        return cls(name, struct.unpack('>' + 'i' * length, length * 4))
+        return cls(name, struct.unpack(
+            '>' + 'i' * length, stream.read(length * 4)))
 
     def write(self, stream):
         super().write(stream)
@@ -258,7 +259,8 @@ class TagLongArray(BaseTag):
     def read(cls, stream, named=True):
         name = named and cls._read_str(stream)
         length = struct.unpack('>i', stream.read(4))[0]
-        return cls(name, struct.unpack('>' + 'q' * length, length * 8))
+        return cls(name, struct.unpack(
+            '>' + 'q' * length, stream.read(length * 8)))
 
     def write(self, stream):
         super().write(stream)
@@ -0,0 +1,64 @@
+"""
+This module contains the compact sequence used for vectors of
+records made only of fixed-size values, such as explosions'.
+"""
+import collections.abc
+
+
+class StructVector(collections.abc.Sequence):
+    """
+    Sequence of fixed-size records, kept as the packed bytes they were
+    received as, and only unpacked into `record` instances on access.
+
+    The `record` class must have a ``_make(values)`` class method
+    to create instances out of the values unpacked with `struct`.
+    """
+    __slots__ = ('record', 'struct', 'data')
+
+    def __init__(self, record, struct, data):
+        self.record = record
+        self.struct = struct
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // self.struct.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('vector index out of range')
+
+        return self.record._make(
+            self.struct.unpack_from(self.data, index * self.struct.size))
+
+    def __iter__(self):
+        return map(self.record._make, self.struct.iter_unpack(self.data))
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def unpack(self):
+        """
+        Returns a list with the values of every record as tuples,
+        which is cheaper than creating the `record` instances.
+        """
+        return list(self.struct.iter_unpack(self.data))
+
+    def array(self):
+        """
+        Returns a NumPy structured array over the records, with one
+        field per slot of the `record`. NumPy must be installed.
+        """
+        import numpy
+        fmt = self.struct.format
+        if isinstance(fmt, bytes):
+            fmt = fmt.decode('ascii')
+
+        return numpy.frombuffer(self.data, dtype=[
+            (name, fmt[0] + code)
+            for name, code in zip(self.record.__slots__, fmt[1:])
+        ])
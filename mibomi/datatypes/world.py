@@ -1,24 +1,185 @@
+import array
 import collections
+import functools
+import logging
+import math
+
+from . import chunk as _chunk
+
+_log = logging.getLogger(__name__)
+
+
+class _Pending:
+    def __repr__(self):
+        return 'PENDING'
+
+
+# Returned for the blocks of chunks that are still being decoded.
+PENDING = _Pending()
 
 
 class World:
     """
     Represents an entire world. Access should be dictionary-like
     through (x, y, z) tuples, such as ``world[149, 64, -13]``.
+
+    Chunks may be fed while they're still being decoded elsewhere
+    with `feed_pending`. Their blocks are `PENDING` until then, and
+    blocks written into them meanwhile are applied once they're ready.
+
+    If there's a `memory_budget` (in bytes), chunks are evicted when
+    fed chunks would exceed it, the farthest from the position given by
+    `center` first (such as the player's), or the least recently used
+    ones if it's ``None`` or returns ``None``. Blocks in unknown chunks
+    are air, and blocks written into them are ignored.
+
+    The amount of chunks is given by ``len(world)``, and the bytes
+    they use approximately by `memory`.
     """
-    def __init__(self):
-        self._chunks = collections.defaultdict(list)
+    def __init__(self, memory_budget=None, center=None):
+        self.memory_budget = memory_budget
+        self.center = center
+        self._chunks = collections.OrderedDict()  # least recently used first
+        self._pending = {}  # (x, z): (future, [(x, y, z, block) written])
+        self._memory = {}  # (x, z): bytes used by the chunk, if known
+        self._used = 0  # sum of the known `_memory`
+
+    def __len__(self):
+        return len(self._chunks)
+
+    @property
+    def memory(self):
+        """
+        Approximate amount of bytes used by the chunks, including the
+        caches built while reading them (see `Chunk.on_cache`).
+        """
+        if len(self._memory) != len(self._chunks):
+            for key, chunk in self._chunks.items():
+                if key not in self._memory:
+                    self._memory[key] = chunk.memory
+                    self._used += self._memory[key]
+        return self._used
 
     def feed_chunk(self, chunk):
-        self._chunks[chunk.x, chunk.z] = chunk
+        self._pending.pop((chunk.x, chunk.z), None)
+        self._store((chunk.x, chunk.z), chunk)
+
+    def _store(self, key, chunk):
+        self._forget(key)
+        self._chunks[key] = chunk
+        chunk.on_cache = functools.partial(self._cached, key, chunk)
+        if self.memory_budget is not None:
+            self._evict()
+
+    def _forget(self, key):
+        """
+        Removes the chunk, if any, and its used memory.
+        """
+        self._chunks.pop(key, None)
+        self._changed(key)
+
+    def _changed(self, key):
+        """
+        Forgets the memory used by the chunk, to be found again when
+        needed, because it may use more (or less) now, such as after
+        writing blocks into it.
+        """
+        self._used -= self._memory.pop(key, 0)
+
+    def _cached(self, key, chunk, size):
+        """
+        Adds the bytes used by a cache built in the chunk to its memory,
+        unless it's not known yet or the chunk was replaced meanwhile.
+        """
+        if key in self._memory and self._chunks.get(key) is chunk:
+            self._memory[key] += size
+            self._used += size
+
+    def _evict(self):
+        """
+        Evicts chunks until they fit in the memory budget.
+        """
+        if self.memory <= self.memory_budget:
+            return
+
+        center = self.center() if self.center else None
+        if center is None:
+            keys = list(self._chunks)
+        else:
+            x, _, z = center
+
+            def distance(key):
+                return (key[0] * 16 + 8 - x) ** 2 + (key[1] * 16 + 8 - z) ** 2
+
+            keys = sorted(self._chunks, key=distance, reverse=True)
+
+        for key in keys:
+            if self._used <= self.memory_budget:
+                break
+            _log.debug('Evicting chunk %s', key)
+            self._forget(key)
+
+    def feed_pending(self, x, z, future):
+        """
+        Feeds the chunk at the given position once the `asyncio` future
+        resolves to it, unless another chunk is fed there before.
+        """
+        key = x, z
+        self._pending[key] = future, []
+
+        def done(_):
+            pending = self._pending.get(key)
+            if pending is None or pending[0] is not future:
+                return  # the chunk was replaced or unloaded meanwhile
+
+            del self._pending[key]
+            if future.cancelled():
+                return
+
+            exc = future.exception()
+            if exc is not None:
+                _log.error('Failed to decode chunk %s: %s', key, exc)
+                return
+
+            chunk = future.result()
+            for xyz_block in pending[1]:
+                chunk[xyz_block[:3]] = xyz_block[3]
+            self._store(key, chunk)
+
+        future.add_done_callback(done)
+
+    def unload_chunk(self, x, z):
+        """
+        Forgets about the chunk at the given position, even if pending.
+        """
+        self._pending.pop((x, z), None)
+        self._forget((x, z))
+
+    async def wait_chunk(self, x, z):
+        """
+        Returns the chunk at the given position, waiting for it if it's
+        still pending, or ``None`` if it's not known.
+        """
+        pending = self._pending.get((x, z))
+        if pending is not None:
+            try:
+                await pending[0]
+            except Exception:
+                pass  # logged once it's done
+
+        return self._chunks.get((x, z))
 
     def __getitem__(self, xyz):
         x, y, z = xyz
         xh, xl = divmod(x, 16)
         zh, zl = divmod(z, 16)
         chunk = self._chunks.get((xh, zh))
-        if chunk:
+        if chunk is not None:
+            if self.memory_budget is not None:
+                self._chunks.move_to_end((xh, zh))
             return chunk[xl, y, zl]
+        elif (xh, zh) in self._pending:
+            return PENDING
         else:
             return 0
 
@@ -27,13 +188,198 @@ class World:
         xh, xl = divmod(x, 16)
         zh, zl = divmod(z, 16)
         chunk = self._chunks.get((xh, zh))
-        if chunk:
+        pending = self._pending.get((xh, zh))
+        if pending is not None:
+            pending[1].append((xl, y, zl, value))
+        elif chunk is not None:
             chunk[xl, y, zl] = value
+            self._changed((xh, zh))
+
+    def _get_section(self, cx, sy, cz):
+        """
+        Returns the section at the given section position, or ``None``.
+        """
+        chunk = self._chunks.get((cx, cz))
+        if chunk is None or not 0 <= sy < len(chunk.sections):
+            return None
+        if self.memory_budget is not None:
+            self._chunks.move_to_end((cx, cz))
+        return chunk.sections[sy]
+
+    def get_box(self, x0, y0, z0, x1, y1, z1):
+        """
+        Returns the blocks from ``(x0, y0, z0)`` up to, but not including,
+        ``(x1, y1, z1)``, copied section by section.
+
+        The result is a NumPy array of shape ``(y, z, x)`` if it's
+        installed, or else a flat ``array('H')`` in the same order.
+        Blocks in unknown or pending chunks are air.
+        """
+        nx, ny, nz = max(x1 - x0, 0), max(y1 - y0, 0), max(z1 - z0, 0)
+        numpy = _chunk.numpy_or_none()
+        if numpy:
+            out = numpy.zeros((ny, nz, nx), numpy.uint16)
+        else:
+            out = array.array('H', bytes(2 * nx * ny * nz))
+
+        height = _chunk.CHUNK_HEIGHT
+        for sy in range(max(y0, 0) >> 4, (min(y1, height) + 15) >> 4):
+            ya, yb = max(y0, sy * 16), min(y1, sy * 16 + 16)
+            for cz in range(z0 >> 4, (z1 + 15) >> 4):
+                za, zb = max(z0, cz * 16), min(z1, cz * 16 + 16)
+                for cx in range(x0 >> 4, (x1 + 15) >> 4):
+                    section = self._get_section(cx, sy, cz)
+                    if section is None:
+                        continue
+
+                    xa, xb = max(x0, cx * 16), min(x1, cx * 16 + 16)
+                    blocks = section.get_blocks()
+                    if numpy:
+                        blocks = numpy.frombuffer(
+                            blocks, numpy.uint16).reshape(16, 16, 16)
+                        out[ya - y0:yb - y0, za - z0:zb - z0,
+                            xa - x0:xb - x0] = blocks[
+                            ya - sy * 16:yb - sy * 16,
+                            za - cz * 16:zb - cz * 16,
+                            xa - cx * 16:xb - cx * 16]
+                        continue
+
+                    # Copy the blocks row by row along the x axis
+                    for y in range(ya, yb):
+                        for z in range(za, zb):
+                            i = ((y - sy * 16) * 16 + z - cz * 16) * 16 \
+                                - cx * 16
+                            o = ((y - y0) * nz + z - z0) * nx - x0
+                            out[o + xa:o + xb] = blocks[i + xa:i + xb]
+        return out
+
+    def get_blocks(self, coords):
+        """
+        Returns the blocks at the given ``(x, y, z)`` coordinates, such
+        as a NumPy array of shape ``(n, 3)``, looking up every section once.
+
+        The result is a NumPy array if it's installed, or else an
+        ``array('H')``. Blocks in unknown or pending chunks are air.
+        """
+        numpy = _chunk.numpy_or_none()
+        if not numpy:
+            # Reading them packed beats unpacking sections in Python
+            out = array.array('H')
+            sections = {}  # (cx, sy, cz): section, or None
+            for x, y, z in coords:
+                key = x >> 4, y >> 4, z >> 4
+                section = sections.get(key, False)
+                if section is False:
+                    section = sections[key] = self._get_section(*key)
+                out.append(0 if section is None
+                           else section[x & 15, y & 15, z & 15])
+            return out
+
+        coords = numpy.asarray(coords, numpy.int64).reshape(-1, 3)
+        out = numpy.zeros(len(coords), numpy.uint16)
+        x, y, z = coords.T
+        # A single number per section is much faster to group
+        keys, inverse = numpy.unique(
+            ((x >> 4) << 32) + ((z >> 4) << 8) + (y.clip(-16, 256) >> 4) + 1,
+            return_inverse=True)
+        index = ((y & 15) * 16 + (z & 15)) * 16 + (x & 15)
+
+        order = numpy.argsort(inverse, kind='stable')
+        ends = numpy.cumsum(numpy.bincount(inverse, minlength=len(keys)))
+        start = 0
+        for end in ends.tolist():
+            which = order[start:end]
+            first = coords[which[0]] >> 4
+            section = self._get_section(*first.tolist())
+            if section is not None:
+                blocks = numpy.frombuffer(section.get_blocks(), numpy.uint16)
+                out[which] = blocks[index[which]]
+            start = end
+        return out
+
+    def find_nearest(self, block_ids, origin, radius):
+        """
+        Returns the position ``(x, y, z)`` of the nearest of the given
+        blocks to the `origin` that is at most `radius` blocks away from
+        it, or ``None`` if there are none in the known chunks.
+
+        Sections are searched from the nearest to the farthest, skipping
+        those that cannot have any (see `Section.contains`).
+        """
+        block_ids = frozenset(block_ids)
+        ox, oy, oz = map(math.floor, origin)
+        radius = int(radius)
+
+        def gap(o, start):
+            # Distance from o to the closest block in [start, start + 16)
+            return max(start - o, 0, o - start - 15)
+
+        candidates = []
+        for cx in range((ox - radius) >> 4, ((ox + radius) >> 4) + 1):
+            for cz in range((oz - radius) >> 4, ((oz + radius) >> 4) + 1):
+                chunk = self._chunks.get((cx, cz))
+                if chunk is None:
+                    continue
+                for sy, section in enumerate(chunk.sections):
+                    if section is None:
+                        continue
+                    d = gap(ox, cx * 16) ** 2 + gap(oy, sy * 16) ** 2 + \
+                        gap(oz, cz * 16) ** 2
+                    if d <= radius ** 2:
+                        candidates.append((d, cx, sy, cz, section))
+
+        numpy = _chunk.numpy_or_none()
+        best = None
+        best_d = radius ** 2
+        candidates.sort(key=lambda candidate: candidate[:4])
+        for d, cx, sy, cz, section in candidates:
+            if d > best_d:
+                break  # The rest are even farther
+            if not section.contains(block_ids):
+                continue
+
+            bx, by, bz = cx * 16 - ox, sy * 16 - oy, cz * 16 - oz
+            if numpy:
+                found = numpy.isin(
+                    numpy.frombuffer(section.get_blocks(), numpy.uint16),
+                    numpy.array(list(block_ids), numpy.uint16))
+                i = numpy.flatnonzero(found)
+                dist = (i % 16 + bx) ** 2 + (i // 256 + by) ** 2 + \
+                    (i // 16 % 16 + bz) ** 2
+                j = int(dist.argmin())
+                if dist[j] <= best_d:
+                    best_d, i = int(dist[j]), int(i[j])
+                    best = i % 16 + bx + ox, i // 256 + by + oy, \
+                        i // 16 % 16 + bz + oz
+                continue
+
+            for i, block in enumerate(section.get_blocks()):
+                if block in block_ids:
+                    dist = (i % 16 + bx) ** 2 + (i // 256 + by) ** 2 + \
+                        (i // 16 % 16 + bz) ** 2
+                    if dist <= best_d:
+                        best_d = dist
+                        best = i % 16 + bx + ox, i // 256 + by + oy, \
+                            i // 16 % 16 + bz + oz
+        return best
+
+    def height_at(self, x, z):
+        """
+        Returns the height of the highest solid block at the given column,
+        ``None`` if there's none or the chunk is unknown, or `PENDING`.
+        """
+        xh, xl = divmod(x, 16)
+        zh, zl = divmod(z, 16)
+        chunk = self._chunks.get((xh, zh))
+        if chunk is not None:
+            return chunk.height_at(xl, zl)
+        elif (xh, zh) in self._pending:
+            return PENDING
         else:
-            raise NotImplementedError
+            return None
 
     def get_chunk(self, x, z):
         """
-        Returns the chunk at the given position, if known.
+        Returns the chunk at the given position, or ``None`` if unknown.
         """
-        return self._chunks[x, z]
+        return self._chunks.get((x, z))
@@ -3,8 +3,6 @@ Helper module to authenticate a client at Mojang servers.
 
 See https://wiki.vg/Authentication.
 """
-import aiohttp
-
 AUTH_URL = 'https://authserver.mojang.com'
 SESSION_URL = 'https://sessionserver.mojang.com'
 
@@ -43,6 +41,7 @@ async def authenticate(username, password, token=None):
     client. Using an empty token will cause previous ones to be
     invalidated, and the server will generate and return one.
     """
+    import aiohttp  # slow to import, and only needed to go online
     async with aiohttp.ClientSession() as session:
         data = await (await session.post(AUTH_URL + '/authenticate', json=dict(
             agent=dict(
@@ -64,6 +63,7 @@ async def session_join(access_token, profile_id, server_hash):
     """
     Joins a Minecraft online session. Returns ``True`` on success.
     """
+    import aiohttp
     async with aiohttp.ClientSession() as session:
         return (await session.post(SESSION_URL
                                    + '/session/minecraft/join', json=dict(
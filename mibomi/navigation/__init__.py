@@ -0,0 +1,6 @@
+"""
+This package contains the `PathFinder`, which finds the way for the
+bots to walk from one block to another in a `World` using A*, without
+blocking the event loop for long.
+"""
+from .pathfinder import PathFinder, Grid, find_path, WALKABILITY
@@ -0,0 +1,283 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from ..datatypes import blocks
+
+# Kinds of blocks for the sake of walking.
+PASSABLE = 0
+SOLID = 1
+AVOID = 2
+
+
+def _make_walkability():
+    table = bytearray((SOLID,)) * (1 << 16)
+    for block_id in blocks.NON_SOLID:
+        table[block_id] = PASSABLE
+    for block_id in blocks.LIQUIDS | blocks.DANGEROUS:
+        table[block_id] = AVOID
+    return bytes(table)
+
+
+# The kind of every block, as given to `Section.classify`, which keeps
+# the kinds of the blocks in every section until one of them changes.
+WALKABILITY = _make_walkability()
+
+# How far the bots are willing to drop, in blocks.
+MAX_DROP = 3
+
+# The most nodes a search explores before giving up.
+MAX_NODES = 20000
+
+# For how long (in seconds) a search runs before giving up, and before
+# letting the event loop run again (unless it's done in an executor).
+TIMEOUT = 2
+SLICE_TIME = 0.004
+
+# Searches for goals this far away (in blocks) run in the executor.
+LONG_ROUTE = 64
+
+# Blocks around the start and the goal copied for the executor.
+MARGIN = 32
+
+_SECTION_AIR = None  # missing sections in known chunks
+_SECTION_UNKNOWN = b''  # sections in chunks that are not known
+
+_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class Grid:
+    """
+    Tells the kind of blocks (`PASSABLE`, `SOLID` or `AVOID`) by their
+    position, reading them from the sections of the `world` as needed,
+    or only from the kinds in `sections`, ``{(x, y, z): bytes}`` by the
+    position of the section, and the copies made by `snapshot`.
+
+    Blocks in unknown chunks are avoided.
+    """
+    def __init__(self, world=None, sections=None):
+        self._world = world
+        self._sections = {} if sections is None else sections
+        self._copies = {}  # {(x, y, z): Section} yet to classify
+
+    @classmethod
+    def snapshot(cls, world, x0, z0, x1, z1):
+        """
+        Returns a grid with a copy of all the sections in the known chunks
+        from ``(x0, z0)`` up to ``(x1, z1)``, both included, which can be
+        used from another thread.
+
+        Copying them is cheap, so that it can be done in the event loop,
+        and the kinds of their blocks are found later, as they're used.
+        """
+        grid = cls()
+        for cx in range(x0 >> 4, (x1 >> 4) + 1):
+            for cz in range(z0 >> 4, (z1 >> 4) + 1):
+                chunk = world.get_chunk(cx, cz)
+                if chunk is None:
+                    continue  # Unknown, as is everything outside the world
+                for sy, section in enumerate(chunk.sections):
+                    if section is None:
+                        grid._sections[cx, sy, cz] = _SECTION_AIR
+                    else:
+                        grid._copies[cx, sy, cz] = section.copy()
+                for sy in range(len(chunk.sections), 17):
+                    grid._sections[cx, sy, cz] = _SECTION_AIR
+        return grid
+
+    def _section(self, key):
+        section = self._copies.pop(key, None)
+        if section is not None:
+            kinds = section.classify(WALKABILITY)
+            self._sections[key] = kinds
+            return kinds
+
+        if self._world is None:
+            return _SECTION_UNKNOWN
+
+        cx, sy, cz = key
+        chunk = self._world.get_chunk(cx, cz)
+        if chunk is None or sy < 0:
+            kinds = _SECTION_UNKNOWN  # There's only void below the world
+        elif sy >= len(chunk.sections) or chunk.sections[sy] is None:
+            kinds = _SECTION_AIR
+        else:
+            kinds = chunk.sections[sy].classify(WALKABILITY)
+
+        self._sections[key] = kinds
+        return kinds
+
+    def __getitem__(self, xyz):
+        x, y, z = xyz
+        kinds = self._sections.get((x >> 4, y >> 4, z >> 4), False)
+        if kinds is False:
+            kinds = self._section((x >> 4, y >> 4, z >> 4))
+        if kinds is None:
+            return PASSABLE
+        elif not kinds:
+            return AVOID
+        else:
+            return kinds[((y & 15) * 16 + (z & 15)) * 16 + (x & 15)]
+
+    def can_stand(self, x, y, z):
+        """
+        Whether a player fits with their feet at the given block.
+        """
+        return self[x, y - 1, z] == SOLID and self[x, y, z] == PASSABLE \
+            and self[x, y + 1, z] == PASSABLE
+
+
+def _neighbours(grid, x, y, z):
+    """
+    Yields the positions that can be walked to from the given one,
+    along with the cost of doing so.
+    """
+    head_room = grid[x, y + 2, z] == PASSABLE
+    for dx, dz in _STEPS:
+        nx, nz = x + dx, z + dz
+        if grid[nx, y, nz] == SOLID:
+            # Jump onto the block, if there's room to do so
+            if head_room and grid.can_stand(nx, y + 1, nz):
+                yield (nx, y + 1, nz), 2
+            continue
+
+        if grid[nx, y, nz] != PASSABLE or grid[nx, y + 1, nz] != PASSABLE:
+            continue
+
+        for ny in range(y, y - MAX_DROP - 1, -1):
+            below = grid[nx, ny - 1, nz]
+            if below == SOLID:
+                yield (nx, ny, nz), 1 + (y - ny)
+                break
+            elif below != PASSABLE:
+                break
+
+
+def _search(grid, start, goal, max_nodes):
+    """
+    Runs A* from `start` to `goal`, yielding every few nodes so that
+    the caller can stop for a while, and returning the path (or ``None``)
+    once it's done.
+    """
+    gx, gy, gz = goal
+
+    def estimate(node):
+        # Every step moves one block, and going up costs an extra one
+        return abs(node[0] - gx) + abs(node[2] - gz) + max(gy - node[1], 0)
+
+    tie = itertools.count()
+    came_from = {start: None}
+    cost = {start: 0}
+    frontier = [(estimate(start), next(tie), start)]
+    explored = 0
+    while frontier:
+        _, _, node = heapq.heappop(frontier)
+        if node == goal:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = came_from[node]
+            return path[::-1]
+
+        explored += 1
+        if explored > max_nodes:
+            return None
+        if explored % 64 == 0:
+            yield
+
+        for neighbour, step in _neighbours(grid, *node):
+            new_cost = cost[node] + step
+            if new_cost < cost.get(neighbour, math.inf):
+                cost[neighbour] = new_cost
+                came_from[neighbour] = node
+                heapq.heappush(frontier, (
+                    new_cost + estimate(neighbour), next(tie), neighbour))
+
+    return None
+
+
+def find_path(grid, start, goal, max_nodes=MAX_NODES, deadline=None):
+    """
+    Returns the list of blocks to walk through from `start` to `goal`
+    (both included) with their feet in the given `Grid`, or ``None`` if
+    there's no way found after exploring `max_nodes`, or by the given
+    `deadline` (as returned by `time.perf_counter`).
+
+    This may take a while, which is why `PathFinder` runs it in slices
+    or in an executor.
+    """
+    search = _search(grid, tuple(start), tuple(goal), max_nodes)
+    while True:
+        try:
+            next(search)
+        except StopIteration as e:
+            return e.value
+
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+
+
+class PathFinder:
+    """
+    Finds paths in the `world` with `find_path`, exploring at most
+    `max_nodes` blocks for up to `timeout` seconds, and letting the
+    event loop run every `slice_time` seconds.
+
+    Paths to goals further than `LONG_ROUTE` blocks are found in
+    the `executor` instead if given, from a copy of the world around
+    them, such as with a `concurrent.futures.ThreadPoolExecutor`.
+
+    The kind of every block (see `WALKABILITY`) is kept by each section
+    until a block in it changes, such as due to block change packets,
+    so searching again through the same area is cheaper.
+    """
+    def __init__(self, world, *, max_nodes=MAX_NODES, timeout=TIMEOUT,
+                 slice_time=SLICE_TIME, executor=None):
+        self.world = world
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.slice_time = slice_time
+        self.executor = executor
+
+    async def find_path(self, start, goal):
+        """
+        Returns the list of blocks to walk through from `start` to `goal`
+        (both included, and may be given as coordinates of the player),
+        or ``None`` if it's not possible or it would take too long.
+        """
+        start = tuple(map(math.floor, start))
+        goal = tuple(map(math.floor, goal))
+        distance = abs(goal[0] - start[0]) + abs(goal[2] - start[2])
+        give_up = time.perf_counter() + self.timeout
+        if self.executor is not None and distance > LONG_ROUTE:
+            grid = Grid.snapshot(
+                self.world,
+                min(start[0], goal[0]) - MARGIN,
+                min(start[2], goal[2]) - MARGIN,
+                max(start[0], goal[0]) + MARGIN,
+                max(start[2], goal[2]) + MARGIN)
+            # The search stops by itself once it's given up on, rather
+            # than keeping the executor busy after the wait times out
+            future = asyncio.get_event_loop().run_in_executor(
+                self.executor, find_path, grid, start, goal, self.max_nodes,
+                give_up)
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        search = _search(Grid(self.world), start, goal, self.max_nodes)
+        while True:
+            deadline = min(time.perf_counter() + self.slice_time, give_up)
+            try:
+                next(search)  # Even if the slices are too short
+                while time.perf_counter() < deadline:
+                    next(search)
+            except StopIteration as e:
+                return e.value
+
+            if time.perf_counter() >= give_up:
+                return None
+            await asyncio.sleep(0)
@@ -6,17 +6,18 @@ import math
 import os
 import time
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives.serialization import load_der_public_key
-
 from . import requester
-from ..datatypes import types, enums, DataRW, Chunk, World, Entities
+from .connection import OFFLOAD_THRESHOLD
+from .inbox import PacketQueue, QUEUE_SIZE, merge_relative_move, \
+    merge_look_and_relative_move, merge_time_update
+from .. import protocols
+from ..datatypes import enums, DataReader, DataWriter, Chunk, World, Entities
+from ..datatypes.chunk import read_sections
 from ..mojang import authenticator
 from ..utils import Timer
 
-PROTOCOL_V1_12_2 = 340
+# Protocol version sent to ask the server which one it's running
+PROTOCOL_UNKNOWN = -1
 
 _log = logging.getLogger(__name__)
 
@@ -30,23 +31,153 @@ class Client(requester.Requester):
 
     You are encouraged to subclass this class when
     creating your own bot client.
+
+    The client speaks the given `protocol` version, or, if it's
+    ``None``, the one of the server, found out by pinging it when
+    logging in (see `select_protocol`).
+
+    With `coalesce`, the packets sent while running are
+    written together once per iteration of the game loop.
+
+    Large packets are (de)compressed and decrypted in the
+    `executor`, which is available to subclasses as well.
+    Sent packets are compressed with `compression_level`.
+
+    The data of chunks is decoded in the `chunk_executor` if given,
+    such as a `concurrent.futures.ProcessPoolExecutor`, and they're
+    pending in the `world` until then (see `World.feed_pending`).
+    Chunks are evicted from the `world` when they use more than
+    `memory_budget` bytes, the farthest from the player first.
+
+    While running, packets are read and decoded by their own task
+    into a queue of up to `queue_size` packets, and handled from
+    there, so that slow handlers don't stall reading. Handlers for
+    the types in `IMMEDIATE` run right away instead, and see `DROP`,
+    `COALESCE` and `CONCURRENCY` for the policies of other types.
+    Types are given by their name, since their class and ID depend
+    on the protocol version.
+
+    Packets are only decoded if the class has an ``on_<name>`` handler
+    for them (see `HANDLED`), unless `on_generic` is overridden.
     """
-    def __init__(self, ip, port=25565, *, loop=None):
-        super().__init__(ip, port, loop=loop)
-        self.world = World()
+    # Packets handled by the reader as soon as they arrive, so that
+    # they never wait behind others. Their handlers must be quick.
+    IMMEDIATE = frozenset({'keep_alive'})
+
+    # Packets discarded when the queue is full, rather than waiting.
+    DROP = frozenset({'entity_head_look', 'entity_velocity'})
+
+    # How packets are merged into a previous one of the same type (and
+    # entity) that is still waiting to be handled, rather than queued.
+    COALESCE = {
+        'entity_relative_move': merge_relative_move,
+        'entity_look_and_relative_move': merge_look_and_relative_move,
+        'time_update': merge_time_update,
+    }
+
+    # How many handlers of these packet types may run at once in the
+    # background. The rest of types are handled one after another.
+    CONCURRENCY = {}
+
+    # Names of the packets with a handler, set when the class is created.
+    # The rest are skipped without being decoded.
+    HANDLED = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.HANDLED = cls._find_handled()
+
+    @classmethod
+    def _find_handled(cls):
+        """
+        Returns the names of the packet types that have a handler
+        other than `on_generic` and `on_unknown`.
+        """
+        return frozenset(
+            name[3:] for name in dir(cls) if name.startswith('on_')
+        ) - {'generic', 'unknown'}
+
+    @classmethod
+    def _find_handled_ids(cls, types):
+        """
+        Returns the IDs of the packets in the given `types` module that
+        have a handler, or all of them if `on_generic` is overridden.
+        """
+        if cls.on_generic is not Client.on_generic:
+            return frozenset(types.NAMES)
+
+        return frozenset(pid for pid, name in types.NAMES.items()
+                         if name in cls.HANDLED)
+
+    def __init__(self, ip, port=25565, *, loop=None, coalesce=False,
+                 executor=None, offload_threshold=OFFLOAD_THRESHOLD,
+                 compression_level=-1, queue_size=QUEUE_SIZE,
+                 protocol=None, chunk_executor=None, memory_budget=None):
+        super().__init__(ip, port, loop=loop, coalesce=coalesce,
+                         executor=executor,
+                         offload_threshold=offload_threshold,
+                         compression_level=compression_level)
+        self.world = World(memory_budget, center=lambda: self.position)
         self.entities = Entities()
         self.position = None
-        self._id_to_handler = {
-            pid: getattr(self, 'on_' + cls.NAME)
-            if hasattr(self, 'on_' + cls.NAME)
-            else self.on_generic
-            for pid, cls in types.TYPES.items()
-        }
+        self.queue_size = queue_size
+        self.chunk_executor = chunk_executor
+        self._handled = frozenset()
+        self._id_to_handler = {}
+        self._immediate = frozenset()
+        self._inbox = None
+        self._semaphores = {}
+        if protocol is not None:
+            self.use_protocol(protocol)
 
         self._running = False
         self._disconnect_timer = Timer(
             20, self.keep_alive_disconnect, loop=loop)
 
+    def use_protocol(self, version):
+        """
+        Makes the client speak the given protocol version from now on.
+
+        Raises `ValueError` if the version is not supported.
+        """
+        self.protocol = protocols.load(version)
+        types = self.protocol.types
+        by_name = {name: pid for pid, name in types.NAMES.items()}
+
+        def classes(names):
+            return [(name, types.TYPES[by_name[name]])
+                    for name in names if name in by_name]
+
+        self._handled = self._find_handled_ids(types)
+        self._id_to_handler = {
+            pid: getattr(self, 'on_' + name, self.on_generic)
+            for pid, name in types.NAMES.items()
+        }
+        self._immediate = frozenset(
+            cls for _, cls in classes(self.IMMEDIATE))
+        self._inbox = PacketQueue(
+            self._loop, self.queue_size,
+            {cls: self.COALESCE[name] for name, cls in classes(self.COALESCE)},
+            [cls for _, cls in classes(self.DROP)])
+        self._semaphores = {
+            cls: asyncio.Semaphore(self.CONCURRENCY[name], loop=self._loop)
+            for name, cls in classes(self.CONCURRENCY)
+        }
+
+    async def select_protocol(self):
+        """
+        Pings the server to find out its protocol version, uses it,
+        and reconnects (since the server closes the connection after
+        the ping). Returns the status of the server.
+
+        Raises `ValueError` if the version is not supported.
+        """
+        status = await self.ping()
+        self.use_protocol(status['version']['protocol'])
+        self.disconnect()
+        await self.connect()
+        return status
+
     async def ping(self):
         await self._handshake(enums.HandshakeState.STATUS)
         await self.send(0, b'')
@@ -58,24 +189,33 @@ class Client(requester.Requester):
         """
         Performs a handshake with the server.
         """
-        data = DataRW()
-        data.writevari32(PROTOCOL_V1_12_2)
+        data = DataWriter(0)
+        if self.protocol is None:
+            data.writevari32(PROTOCOL_UNKNOWN)
+        else:
+            data.writevari32(self.protocol.VERSION)
         data.writestr(self.ip)
         data.writefmt('H', self.port)
         data.writevari32(state)
-        await self.send(0, data.getvalue())
+        await self.send_packet(data)
 
     async def login(self, username, access_token=None, profile_id=None):
         """
         Starts the login process with the server until its completion.
+
+        If no protocol is in use yet, it's selected first by pinging
+        the server with `select_protocol`.
         """
+        if self.protocol is None:
+            await self.select_protocol()
+
         # Initial Login Handshake
         await self._handshake(enums.HandshakeState.LOGIN)
 
         # Send the Login Start packet
-        data = DataRW()
+        data = DataWriter(0)
         data.writestr(username)
-        await self.send(0, data.getvalue())
+        await self.send_packet(data)
 
         # Receive Encryption Request
         pid, data = await self.recv()
@@ -104,6 +244,14 @@ class Client(requester.Requester):
         return player_uuid, player_name
 
     async def _setup_encryption(self, data, access_token, profile_id):
+        # Only needed to play in online mode, and slow to import
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+        from cryptography.hazmat.primitives.ciphers import \
+            Cipher, algorithms, modes
+        from cryptography.hazmat.primitives.serialization import \
+            load_der_public_key
+
         server_id = data.readstr()
         pk_len = data.readvari32()
         pk = data.read(pk_len)
@@ -135,12 +283,12 @@ class Client(requester.Requester):
         encrypted_secret = pk.encrypt(shared_secret, PKCS1v15())
         token = pk.encrypt(verify_token, PKCS1v15())
 
-        data = DataRW()
+        data = DataWriter(1)
         data.writevari32(len(encrypted_secret))
         data.write(encrypted_secret)
         data.writevari32(len(token))
         data.write(token)
-        await self.send(1, data.getvalue())
+        await self.send_packet(data)
 
         # Enable encryption on the socket level
         cipher = Cipher(
@@ -152,27 +300,80 @@ class Client(requester.Requester):
         self._decrypt = cipher.decryptor().update
 
     async def run(self):
+        reader = None
         try:
             self._running = True
+            self.cork()
             self._loop.create_task(self._game_loop())
+            reader = self._loop.create_task(self._read_loop())
+            while True:
+                await self._dispatch(await self._inbox.get())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._running = False
+            if reader:
+                reader.cancel()
+            self.disconnect()
+
+    async def _read_loop(self):
+        """
+        Receives and decodes packets until disconnected, handing
+        them to `run` through the queue.
+        """
+        types = self.protocol.types
+        handled = self._handled
+        # Classes are created on first use, so look them up only once
+        classes = {}
+        try:
             while True:
                 pid, data = await self.recv()
                 try:
-                    if pid in types.TYPES:
-                        await self._id_to_handler[pid](types.TYPES[pid](data))
+                    cls = classes.get(pid)
+                    if cls is None and pid in handled:
+                        cls = classes[pid] = types.TYPES[pid]
+
+                    if cls is not None:
+                        packet = cls(data)
                         left = data.read()
                         if left:
                             _log.warning('Missing data after %d %s', pid, left)
+                    elif pid in types.NAMES:
+                        continue  # nobody would use it, so don't decode it
                     else:
-                        await self.on_unknown(pid, data)
+                        # The data is reused on the next read, so copy it
+                        packet = pid, DataReader(data.read())
                 except Exception as e:
                     _log.exception(
-                        'Unhandled exception processing %s: %s', pid, e)
-        except KeyboardInterrupt:
-            pass
+                        'Unhandled exception decoding %s: %s', pid, e)
+                    continue
+
+                if cls in self._immediate:
+                    await self._handle(packet)
+                else:
+                    await self._inbox.put(packet)
+        except Exception as e:
+            self._inbox.close(e)
+
+    async def _dispatch(self, packet):
+        semaphore = self._semaphores.get(type(packet))
+        if semaphore is None:
+            await self._handle(packet)
+        else:
+            await semaphore.acquire()
+            self._loop.create_task(self._handle(packet, semaphore))
+
+    async def _handle(self, packet, semaphore=None):
+        try:
+            if isinstance(packet, tuple):  # (pid, data) of unknown packets
+                await self.on_unknown(*packet)
+            else:
+                await self._id_to_handler[packet.ID](packet)
+        except Exception as e:
+            _log.exception('Unhandled exception processing %s: %s', packet, e)
         finally:
-            self._running = False
-            self.disconnect()
+            if semaphore is not None:
+                semaphore.release()
 
     async def walk(self, dx, dy, dz, scale=0.1):
         if not self.position:
@@ -203,14 +404,14 @@ class Client(requester.Requester):
     async def on_unknown(self, pid, data):
         _log.debug('Unknown packet %x', pid)
 
-    async def on_keep_alive(self, keep_alive: types.KeepAlive):
+    async def on_keep_alive(self, keep_alive):
         # Keep Alive packet, must respond within 30 seconds
         self._disconnect_timer.reset()
         _log.debug('Responding to keep-alive')
         await self.keep_alive(keep_alive.id)
         await self.player(on_ground=True)  # Send periodically or get kicked
 
-    async def on_player_abilities(self, player_ab: types.PlayerAbilities):
+    async def on_player_abilities(self, player_ab):
         # https://wiki.vg/Protocol_FAQ#What.27s_the_normal_login_sequence
         # _for_a_client.3F
         _log.debug('Responding to Player Abilities and Client Settings')
@@ -224,8 +425,7 @@ class Client(requester.Requester):
             main_hand=1
         )
 
-    async def on_player_position_and_look(
-            self, pos: types.PlayerPositionAndLook):
+    async def on_player_position_and_look(self, pos):
         _log.debug('Received position (%.2f, %.2f, %.2f)', pos.x, pos.y, pos.z)
         await self.teleport_confirm(pos.teleport_id)
 
@@ -238,7 +438,7 @@ class Client(requester.Requester):
         x = math.floor(pos.x)
         y = math.floor(pos.y) - 1
         z = math.floor(pos.z)
-        _log.debug('The block below us (%d, %d, %d) is %d',
+        _log.debug('The block below us (%d, %d, %d) is %s',
                    x, y, z, self.world[x, y, z])
 
     async def on_disconnect(self, obj):
@@ -248,22 +448,37 @@ class Client(requester.Requester):
 
     async def on_generic(self, obj):
         """Callback to handle a generic Packet ID."""
-        if not isinstance(obj, (types.TimeUpdate, types.ChunkData)):
+        if obj.NAME not in ('time_update', 'chunk_data'):
             _log.debug('Received %s: %s', obj.NAME, obj)
 
-    async def on_chunk_data(self, data: types.ChunkData):
-        self.world.feed_chunk(Chunk(data))
+    async def on_chunk_data(self, data):
+        if self.chunk_executor is None:
+            self.world.feed_chunk(Chunk(data))
+        else:
+            self.world.feed_pending(data.x, data.z, self._loop.create_task(
+                self._read_chunk(data)))
+
+    async def _read_chunk(self, data):
+        decoded = await self._loop.run_in_executor(
+            self.chunk_executor, read_sections,
+            data.data, data.bit_mask, data.new_chunk)
+        return Chunk(data, decoded=decoded)
+
+    async def on_unload_chunk(self, data):
+        self.world.unload_chunk(data.x, data.z)
 
-    async def on_block_change(self, data: types.BlockChange):
+    async def on_block_change(self, data):
         x, y, z = data.location
         self.world[x, y, z] = Chunk.get_block_id(data.id)
 
-    async def on_multi_block_change(self, data: types.MultiBlockChange):
-        c = self.world.get_chunk(data.chunk_x, data.chunk_z)
+    async def on_multi_block_change(self, data):
+        # Through the world, in case the chunk is still pending
+        x0 = data.chunk_x * 16
+        z0 = data.chunk_z * 16
         for record in data.records:
-            x = record.h_pos >> 4
-            z = record.h_pos & 0xf
-            c[x, record.y, z] = Chunk.get_block_id(record.block_id)
+            x = x0 + (record.h_pos >> 4)
+            z = z0 + (record.h_pos & 0xf)
+            self.world[x, record.y, z] = Chunk.get_block_id(record.block_id)
 
     async def on_spawn_player(self, data):
         self.entities.feed_player_spawn(data)
@@ -285,6 +500,7 @@ class Client(requester.Requester):
                 await self.game_loop(now - last)
             except Exception as e:
                 _log.exception('Unhandled game loop exception: %s', e)
+            self.flush()
             last = now
             await asyncio.sleep(0.015, loop=self._loop)
 
@@ -294,3 +510,6 @@ class Client(requester.Requester):
     async def keep_alive_disconnect(self):
         _log.info('Server did not send a keep-alive in time; disconnecting')
         self.disconnect()
+
+
+Client.HANDLED = Client._find_handled()
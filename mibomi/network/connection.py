@@ -1,88 +1,244 @@
 import asyncio
-import socket
+import functools
 import zlib
 
-from ..datatypes import DataRW
+from .transport import PacketProtocol, unpack_varint
+from ..datatypes import DataReader, DataWriter
+
+# While coalescing writes, queued frames are flushed early
+# as soon as they amount to at least this many bytes.
+COALESCE_LIMIT = 64 * 1024
+
+# Compressing, decompressing and decrypting at least this many bytes
+# is done in the executor, since it would otherwise block the loop.
+OFFLOAD_THRESHOLD = 64 * 1024
+
+
+def compress(data, level=-1):
+    """
+    Compresses the data of an outgoing packet with the given level,
+    where 0 only stores the data and 1 is the fastest compression.
+    """
+    # Every packet is compressed on its own, so the stream can't be reused.
+    # A window larger than the data is of no use, though, and a smaller one
+    # (with a matching memory level) is cheaper to set up for each packet.
+    # The server is able to inflate data compressed with any window size.
+    wbits = min(max(len(data) - 1, 256).bit_length(), 15)
+    compressor = zlib.compressobj(
+        level, zlib.DEFLATED, wbits, min(wbits - 6, 8))
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data, length):
+    """
+    Decompresses the data of an incoming packet, which must be
+    exactly `length` bytes long once decompressed. The output is
+    allocated with that size up front, so it only grows if the
+    data doesn't match the length (and then it's an error).
+    """
+    try:
+        result = zlib.decompress(data, bufsize=length)
+    except zlib.error as e:
+        raise ValueError('compressed packet is not valid') from e
+    if len(result) != length:
+        raise ValueError('compressed packet does not match its length')
+    return result
 
 
 class Connection:
     """
     This class is responsible for connecting to Minecraft servers,
     pack outgoing data as requests, and unpack incoming messages.
+
+    If `coalesce` is ``True``, packets sent while the connection is
+    `cork`'ed are queued and written all at once when `flush` is
+    called, which saves system calls and TCP segments if several
+    packets are sent in a row.
+
+    Payloads of at least `offload_threshold` bytes are compressed,
+    decompressed and decrypted in the given `executor` (or the loop's
+    default one if it's ``None``), so that large packets don't stall
+    everything else running in the loop. Packet order is preserved.
+    ``None`` as the threshold does all of the work in the loop.
+
+    Outgoing packets are compressed with `compression_level`, which can
+    be lowered to 1 (fastest) or 0 (stored) for CPU-bound bots.
     """
-    def __init__(self, ip, port=25565, *, loop=None):
-        self.sock = None
+    def __init__(self, ip, port=25565, *, loop=None, coalesce=False,
+                 executor=None, offload_threshold=OFFLOAD_THRESHOLD,
+                 compression_level=-1):
         self.ip = ip
         self.port = port
+        self.compression_level = compression_level
+        self.coalesce = coalesce
+        self.executor = executor
+        self.offload_threshold = offload_threshold
         self._loop = loop or asyncio.get_event_loop()
-        self._rlock = asyncio.Lock(loop=self._loop)
+        self._wlock = None  # made on first use, within the loop
+        self._sending = 0  # senders waiting on or holding the write lock
+        self._transport = None
+        self._protocol = None
         self._compression = None
-        self._decrypt = lambda x: x
-        self._encrypt = lambda x: x
+        self._decrypt = None
+        self._encrypt = None
+        self._corked = False
+        self._queued = []
+        self._queued_size = 0
 
     async def connect(self):
         """
         Stabilises a connection to the server.
         """
-        self.sock = socket.socket()
-        self.sock.setblocking(False)
-        await self._loop.sock_connect(self.sock, (self.ip, self.port))
+        self._transport, self._protocol = await self._loop.create_connection(
+            lambda: PacketProtocol(self._loop), self.ip, self.port)
 
     def disconnect(self):
         """
         Cleanly disconnects from the server.
         """
-        self.sock.close()
+        self.flush()
+        self._transport.close()
+
+    def cork(self):
+        """
+        Starts queuing sent packets if `coalesce` is enabled,
+        until `flush` is called or enough of them pile up.
+        """
+        self._corked = self.coalesce
+
+    def uncork(self):
+        """
+        Flushes the queued packets and stops queuing new ones.
+        """
+        self.flush()
+        self._corked = False
+
+    def flush(self):
+        """
+        Writes all the queued packets at once.
+        """
+        if self._queued:
+            self._transport.writelines(self._queued)
+            self._queued.clear()
+            self._queued_size = 0
 
     async def send(self, pid, data):
         """
         Sends a packet with the given Packet ID and payload binary data.
         """
+        writer = DataWriter(pid, len(data) + 5)
+        writer.write(data)
+        await self.send_packet(writer)
+
+    async def send_packet(self, writer):
+        """
+        Sends a packet that has been serialized into the given `DataWriter`,
+        which should have been created with the packet's ID.
+
+        The writer must not be used after it has been sent.
+        """
+        # Packets that may be offloaded (and those sent while one is
+        # being offloaded) take turns, so that they're sent in order.
+        if self._sending or self._offloads(len(writer)):
+            if self._wlock is None:
+                # Newer versions don't take the loop, but use the running one
+                self._wlock = asyncio.Lock()
+            self._sending += 1
+            try:
+                async with self._wlock:
+                    self._write(await self._frame(writer))
+            finally:
+                self._sending -= 1
+        else:
+            # Small enough not to be offloaded, so this won't suspend
+            self._write(await self._frame(writer))
+
+        await self._protocol.drain()
+
+    async def _frame(self, writer):
+        """
+        Turns the packet in the writer into a frame ready to be written.
+        """
+        # Whether the work is offloaded is decided from the packet alone,
+        # just like `send_packet` does, since the frame is a bit larger.
+        # Otherwise the frame could be encrypted in the executor while a
+        # packet sent after it is encrypted and written first.
+        size = len(writer)
+
         # For both modes, the data length that counts is Packet ID and Data
-        data = DataRW.packvari(pid) + data
         if self._compression is not None:
             # If compression is enabled, compress unless below threshold, in
             # which case the inner data length should be 0 (not compressed).
-            if len(data) < self._compression:
-                data_length = 0
+            if len(writer) < self._compression:
+                writer.prefix(0)
             else:
-                data_length = len(data)
-                data = zlib.compress(data)
+                data_length = len(writer)
+                data = await self._run(functools.partial(
+                    compress, level=self.compression_level),
+                    writer.getbuffer(), size)
+                writer = DataWriter(size=len(data) + 5)
+                writer.writevari32(data_length)
+                writer.write(data)
 
-            data = DataRW.packvari(data_length) + data
+        writer.prefix(len(writer))
+        frame = writer.getbuffer()
+        if self._encrypt is not None:
+            frame = await self._run(self._encrypt, frame, size)
+        return frame
 
-        data = DataRW.packvari(len(data)) + data
-        await self._loop.sock_sendall(self.sock, data)
+    def _write(self, frame):
+        if self._corked:
+            self._queued.append(frame)
+            self._queued_size += len(frame)
+            if self._queued_size >= COALESCE_LIMIT:
+                self.flush()
+        else:
+            self._transport.write(frame)
+
+    def _offloads(self, size):
+        return self.offload_threshold is not None \
+            and size >= self.offload_threshold
+
+    async def _run(self, function, data, size=None):
+        """
+        Runs ``function(data)``, in the executor if `data` (or `size`,
+        if given) is large enough to be offloaded.
+        """
+        if self._offloads(len(data) if size is None else size):
+            return await self._loop.run_in_executor(
+                self.executor, function, data)
+        else:
+            return function(data)
 
     async def recv(self):
         """
-        Receives a packet from the network, returning ``(Packet ID, DataRW)``.
+        Receives a packet from the network, returning
+        ``(Packet ID, DataReader)``.
+
+        Uncompressed packets are read straight from the receive buffer,
+        so they must be read before `recv` is called again. For the same
+        reason, only one coroutine should be receiving at any given time.
         """
-        async with self._rlock:
-            length = await DataRW.aunpackvari(self._recv1)
-            data = DataRW(await self.read(length))
+        frame = await self._protocol.read_frame(self._decrypt, self._run)
 
+        # The frame is a view into the receive buffer, so it must be
+        # used before the next read. Decompress straight from it.
         if self._compression is not None:
-            data_length = data.readvari32()
+            data_length, size = unpack_varint(frame)
+            frame = frame[size:]
             if data_length:
                 assert data_length >= self._compression
-                data = zlib.decompress(data.read())
-                assert len(data) == data_length
-                data = DataRW(data)
+                frame = await self._run(functools.partial(
+                    decompress, length=data_length), frame, data_length)
 
+        data = DataReader(frame)
         return data.readvari32(), data
 
-    async def _recv1(self):
-        return self._decrypt(await self._loop.sock_recv(self.sock, 1))[0]
-
     async def read(self, n):
         """
         Reads *exactly* `n` bytes from the network.
         """
-        data = b''
-        while len(data) != n:
-            data += await self._loop.sock_recv(self.sock, n - len(data))
-        return self._decrypt(data)
+        return await self._protocol.read_exactly(n, self._decrypt, self._run)
 
     async def __aenter__(self):
         await self.connect()
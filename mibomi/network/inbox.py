@@ -0,0 +1,153 @@
+"""
+This module contains the bounded queue that sits between the task
+reading packets from the network and the one handling them, so that
+slow handlers don't hold up reading, and reading applies backpressure
+(by simply not reading) once too many packets are waiting.
+"""
+import collections
+
+# Amount of received packets that may be waiting to be handled at once.
+QUEUE_SIZE = 1024
+
+
+def merge_relative_move(old, new):
+    """
+    Merges two relative moves of the same entity into the first one.
+    """
+    old.dx += new.dx
+    old.dy += new.dy
+    old.dz += new.dz
+    old.on_ground = new.on_ground
+
+
+def merge_look_and_relative_move(old, new):
+    """
+    Merges two relative moves with look of the same entity into the first.
+    """
+    merge_relative_move(old, new)
+    old.yaw = new.yaw
+    old.pitch = new.pitch
+
+
+def merge_time_update(old, new):
+    """
+    Keeps only the latest time in the first time update.
+    """
+    old.world_age = new.world_age
+    old.time_of_day = new.time_of_day
+
+
+class PacketQueue:
+    """
+    Bounded FIFO queue of received packets.
+
+    Packets whose type has a merge function in `coalesce` are merged
+    into the previous packet of the same type and ``id`` (if any) as
+    long as it's still waiting, and no other packet with the same
+    ``id`` was queued after it, so the outcome of handling them is
+    the same. Packets whose type is in `drop` are discarded instead
+    of waiting for room when the queue is full.
+
+    Only one coroutine should be putting packets, and only one
+    getting them, at any given time.
+    """
+    def __init__(self, loop, maxsize=QUEUE_SIZE, coalesce=None, drop=()):
+        self.maxsize = maxsize
+        self.coalesce = dict(coalesce or {})
+        self.drop = frozenset(drop)
+        self.dropped = 0
+        self.merged = 0
+        self._loop = loop
+        self._items = collections.deque()
+        self._pending = {}  # (type, id): packet that may still absorb others
+        self._getter = None
+        self._putter = None
+        self._closed = False
+        self._exc = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def full(self):
+        return len(self._items) >= self.maxsize
+
+    async def put(self, packet):
+        """
+        Queues the packet, waiting until there is room for it unless
+        it's merged into a waiting packet or it may be dropped.
+        """
+        cls = type(packet)
+        pid = getattr(packet, 'id', None)
+        merge = self.coalesce.get(cls)
+        if merge is not None:
+            old = self._pending.get((cls, pid))
+            if old is not None:
+                merge(old, packet)
+                self.merged += 1
+                return
+
+        if len(self._items) >= self.maxsize:
+            if cls in self.drop:
+                self.dropped += 1
+                return
+
+            while len(self._items) >= self.maxsize:
+                self._putter = self._loop.create_future()
+                await self._putter
+
+            # Anything could have been queued meanwhile, so check again
+            if merge is not None:
+                old = self._pending.get((cls, pid))
+                if old is not None:
+                    merge(old, packet)
+                    self.merged += 1
+                    return
+
+        if pid is not None:
+            # Newer packets can't be merged past one for the same ID
+            for other in self.coalesce:
+                if other is not cls:
+                    self._pending.pop((other, pid), None)
+
+        if merge is not None:
+            self._pending[cls, pid] = packet
+
+        self._items.append(packet)
+        self._wakeup('_getter')
+
+    async def get(self):
+        """
+        Returns the next packet, waiting for one if there are none.
+
+        Raises `ConnectionError` once all the packets queued before
+        the queue was closed have been returned.
+        """
+        while not self._items:
+            if self._closed:
+                raise ConnectionError('Connection closed') from self._exc
+
+            self._getter = self._loop.create_future()
+            await self._getter
+
+        packet = self._items.popleft()
+        key = type(packet), getattr(packet, 'id', None)
+        if self._pending.get(key) is packet:
+            del self._pending[key]
+
+        self._wakeup('_putter')
+        return packet
+
+    def close(self, exc=None):
+        """
+        Closes the queue, optionally because of the given exception.
+        """
+        self._closed = True
+        self._exc = exc
+        self._wakeup('_getter')
+
+    def _wakeup(self, name):
+        waiter = getattr(self, name)
+        if waiter is not None:
+            setattr(self, name, None)
+            if not waiter.done():
+                waiter.set_result(None)
@@ -0,0 +1,231 @@
+"""
+This module contains the `asyncio` protocol used by the `Connection`
+to receive data from the network in large chunks and split complete
+frames out of it, instead of issuing one system call per byte.
+"""
+import asyncio
+import collections
+
+# Initial size of the receive buffer. It is reused for as long as the
+# connection lives, and only replaced when a frame does not fit in it.
+BUFFER_SIZE = 256 * 1024
+
+# Smallest amount of free space offered to the socket on every read.
+MIN_READ = 16 * 1024
+
+# Reading from the socket is paused once this many bytes are buffered
+# without being consumed, and resumed once they drop below half of it.
+HIGH_WATER = 4 * 1024 * 1024
+
+
+class PacketProtocol(asyncio.BufferedProtocol):
+    """
+    Protocol that receives all incoming data straight into a
+    preallocated buffer, from which length-prefixed frames can
+    be read one after another as `memoryview` slices.
+
+    A frame is only valid until the next read, since the space
+    it occupies will be reused. Only one coroutine should be
+    reading frames at any given time.
+    """
+    def __init__(self, loop, size=BUFFER_SIZE):
+        self.transport = None
+        self._loop = loop
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # buffer[start:end] has not been consumed yet
+        self._plain = 0  # buffer[start:plain] has already been decrypted
+        self._end = 0
+        self._waiter = None
+        self._drain_waiters = collections.deque()  # one per sender
+        self._exc = None
+        self._closed = False
+        self._paused = False
+        self._write_paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        if len(self._buffer) - self._end < MIN_READ:
+            self._relocate(max(sizehint, MIN_READ))
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes):
+        self._end += nbytes
+        self._wakeup()
+        if not self._paused and self._end - self._start > HIGH_WATER:
+            self._paused = True
+            self.transport.pause_reading()
+
+    def eof_received(self):
+        self._closed = True
+        self._wakeup()
+
+    def connection_lost(self, exc):
+        self._closed = True
+        self._exc = exc
+        self._wakeup()
+        self._write_paused = False
+        self._wakeup_drain(exc)
+
+    def pause_writing(self):
+        self._write_paused = True
+
+    def resume_writing(self):
+        self._write_paused = False
+        self._wakeup_drain()
+
+    def _wakeup_drain(self, exc=None):
+        for waiter in self._drain_waiters:
+            if not waiter.done():
+                if exc is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(exc)
+
+    async def drain(self):
+        """
+        Waits until the transport's write buffer has been flushed
+        enough for more data to be written to it.
+        """
+        if self._write_paused and not self._closed:
+            waiter = self._loop.create_future()
+            self._drain_waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                self._drain_waiters.remove(waiter)
+
+    async def read_frame(self, decrypt=None, run=None):
+        """
+        Reads the next length-prefixed frame, and returns a `memoryview`
+        over it. Data that was not seen before is decrypted with `decrypt`,
+        through the ``await run(decrypt, data)`` coroutine if given.
+        """
+        self._compact()
+        while True:
+            await self._decrypt_pending(decrypt, run)
+            length, size = unpack_varint(self._view, self._start, self._end)
+            if length is not None:
+                start = self._start + size
+                if start + length <= self._end:
+                    return self._consume(start, length)
+
+                # Make sure that the frame will fit once it arrives
+                if start + length > len(self._buffer):
+                    self._relocate(length + size)
+
+            await self._wait()
+
+    async def read_exactly(self, n, decrypt=None, run=None):
+        """
+        Reads *exactly* `n` bytes, decrypting unseen data as `read_frame`.
+        """
+        self._compact()
+        while True:
+            await self._decrypt_pending(decrypt, run)
+            if self._start + n <= self._end:
+                return self._consume(self._start, n)
+
+            if self._start + n > len(self._buffer):
+                self._relocate(n)
+
+            await self._wait()
+
+    async def _decrypt_pending(self, decrypt, run):
+        n = self._end - self._plain
+        if not n:
+            return
+        if decrypt is None:
+            self._plain = self._end
+            return
+
+        view = self._view[self._plain:self._end]
+        if run is None:
+            data = decrypt(view)
+        else:
+            # The buffer may be replaced meanwhile, but the old one is
+            # kept alive by the view and `plain` is moved accordingly.
+            data = await run(decrypt, view)
+
+        self._view[self._plain:self._plain + n] = data
+        self._plain += n
+
+    def _consume(self, start, length):
+        self._start = start + length
+        if self._paused and self._end - self._start < HIGH_WATER // 2:
+            self._paused = False
+            self.transport.resume_reading()
+        return self._view[start:self._start]
+
+    def _compact(self):
+        """
+        Moves the unconsumed data back to the start of the buffer.
+
+        This must only be called once the previous frame is no longer
+        needed, since the same memory is overwritten.
+        """
+        if self._start == self._end:
+            self._start = self._plain = self._end = 0
+        elif self._start > len(self._buffer) // 2:
+            live = self._end - self._start
+            self._view[:live] = self._view[self._start:self._end]
+            self._plain -= self._start
+            self._start = 0
+            self._end = live
+
+    def _relocate(self, extra):
+        """
+        Moves the unconsumed data into a new buffer with room for at
+        least `extra` more bytes. Frames handed out before keep their
+        contents, since they still reference the old buffer.
+        """
+        live = self._end - self._start
+        size = len(self._buffer)
+        while size < live + extra:
+            size *= 2
+
+        buffer = bytearray(size)
+        buffer[:live] = self._view[self._start:self._end]
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._plain -= self._start
+        self._start = 0
+        self._end = live
+
+    async def _wait(self):
+        if self._closed:
+            raise ConnectionError('Connection closed') from self._exc
+
+        self._waiter = self._loop.create_future()
+        await self._waiter
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+def unpack_varint(buffer, start=0, end=None):
+    """
+    Unpacks the variable-length integer at `buffer[start:end]`.
+
+    Returns ``(value, size)``, or ``(None, 0)`` if it is incomplete.
+    """
+    if end is None:
+        end = len(buffer)
+
+    value = 0
+    for i in range(min(end - start, 5)):
+        byte = buffer[start + i]
+        value |= (byte & 0x7f) << (7 * i)
+        if not (byte & 0x80):
+            return value, i + 1
+
+    if end - start >= 5:
+        raise ValueError('variable length integer is too long')
+
+    return None, 0
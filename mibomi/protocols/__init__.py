@@ -0,0 +1,36 @@
+"""
+This package contains the generated code for every supported protocol
+version, each in a ``v<version>`` package with the client-bound `types`
+and the `serverbound` ones, so that the same `Client` can play in
+servers running different versions of the game.
+
+Only the versions that are actually used are ever imported.
+"""
+import importlib
+import pkgutil
+
+# Protocol versions with a generated package, from oldest to newest
+SUPPORTED = tuple(sorted(
+    int(info.name[1:]) for info in pkgutil.iter_modules(__path__)
+    if info.ispkg and info.name[:1] == 'v' and info.name[1:].isdigit()
+))
+
+# Protocol version used when none is given, the newest one supported
+DEFAULT = SUPPORTED[-1] if SUPPORTED else None
+
+
+def load(version=None):
+    """
+    Returns the package of the given protocol version (or the
+    `DEFAULT` one), importing it the first time it's needed.
+
+    Raises `ValueError` if the version is not supported.
+    """
+    if version is None:
+        version = DEFAULT
+
+    if version not in SUPPORTED:
+        raise ValueError('unsupported protocol version {} (supported: {})'
+                         .format(version, ', '.join(map(str, SUPPORTED))))
+
+    return importlib.import_module('.v{}'.format(version), __name__)
@@ -1,20 +1,26 @@
 """
-This bot will follow the users who say "follow" in the chat.
+This bot will follow the users who say "follow" in the chat,
+finding its way around the walls in between.
 
 Note that the bot does not bother with authentication, so only
 offline servers will work. "stop" will prevent the bot from moving.
 """
 import asyncio
 import json
+import math
 import sys
 
 import mibomi
+from mibomi.navigation import PathFinder
 
 
 class Follower(mibomi.Client):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._following = None
+        self._finder = PathFinder(self.world)
+        self._path = []
+        self._goal = None
 
     async def on_chat_message(self, item):
         item = json.loads(item.data)['with']
@@ -27,6 +33,7 @@ class Follower(mibomi.Client):
                     return
         elif item[1] == 'stop':
             self._following = None
+            self._path = []
             await self.look(1, -1, 1)
 
     async def game_loop(self, dt):
@@ -38,13 +45,29 @@ class Follower(mibomi.Client):
         tx, ty, tz = target.x, target.y, target.z
         dx, dy, dz = tx - sx, ty - sy, tz - sz
         dist = (dx ** 2 + dy ** 2 + dz ** 2) ** 0.5
-        if dist > 2:
-            dx /= dist
-            dy /= dist
-            dz /= dist
-            await self.walk(dx, dy, dz)
-        else:
+        if dist <= 2:
+            self._path = []
             await self.look(dx, dy, dz)
+            return
+
+        goal = math.floor(tx), math.floor(ty), math.floor(tz)
+        if not self._path or goal != self._goal:
+            self._goal = goal
+            self._path = await self._finder.find_path(
+                self.position, goal) or []
+            if not self._path:
+                return  # There's no way to get there
+
+        # Walk towards the center of the next block in the path. Walking
+        # doesn't change the height, which is set once the block is reached
+        x, y, z = self._path[0]
+        dx, dy, dz = x + 0.5 - sx, y - sy, z + 0.5 - sz
+        dist = (dx ** 2 + dz ** 2) ** 0.5
+        if dist < 0.3:
+            self._path.pop(0)
+            self.position = x + 0.5, y, z + 0.5
+        else:
+            await self.walk(dx / dist, dy / dist, dz / dist)
 
 
 async def main():
@@ -0,0 +1,220 @@
+import array
+import pickle
+import random
+import struct
+import unittest
+
+from mibomi.datatypes import DataRW, DataReader, blocks, chunk, types
+from tests.utils import NumPyMixin, empty_chunk
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def pack(indices, bpb):
+    """
+    Packs the palette indices into longs from low to high bits,
+    as the server does, so some of them span two longs.
+    """
+    bits = 0
+    for i, index in enumerate(indices):
+        bits |= index << (i * bpb)
+
+    length = -(-len(indices) * bpb // 64)
+    return struct.pack('>{}Q'.format(length), *(
+        (bits >> (64 * i)) & 0xffffffffffffffff for i in range(length)))
+
+
+def section(bpb, indices, palette):
+    """
+    Returns a `DataReader` over the data of a section in the overworld.
+    """
+    data = DataRW()
+    data.writefmt('B', bpb)
+    if palette is None:
+        data.writevari32(0)
+    else:
+        data.writevari32(len(palette))
+        for block_id in palette:
+            data.writevari32(block_id << 4)
+
+    longs = pack(indices, bpb)
+    data.writevari32(len(longs) // 8)
+    data.write(longs)
+    data.write(bytes(4096))
+    return DataReader(data.getvalue())
+
+
+class TestChunk(NumPyMixin, unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.cases = []
+        for bpb in (4, 5, 7, 8, 13):
+            indices = [rng.randrange(1 << bpb)
+                       for _ in range(chunk.SECTION_SIZE)]
+            palette = None
+            if bpb <= 8:
+                palette = [rng.randrange(4096) for _ in range(1 << bpb)]
+            self.cases.append((bpb, indices, palette))
+
+    def expected(self, indices, palette):
+        return indices if palette is None else [palette[i] for i in indices]
+
+    def test_unpack_loop(self):
+        for bpb, indices, palette in self.cases:
+            self.assertEqual(
+                list(chunk._unpack_blocks_loop(
+                    pack(indices, bpb), bpb, palette)),
+                self.expected(indices, palette))
+
+    @unittest.skipUnless(numpy, 'numpy is not installed')
+    def test_unpack_numpy(self):
+        for bpb, indices, palette in self.cases:
+            blocks = chunk._unpack_blocks_numpy(
+                numpy, memoryview(pack(indices, bpb)), bpb, palette)
+            self.assertEqual(list(blocks), self.expected(indices, palette))
+
+    def test_pack(self):
+        for bpb, indices, _ in self.cases:
+            self.assertEqual(chunk._pack_blocks(indices, bpb),
+                             pack(indices, bpb))
+
+    def assertBlocks(self, s, blocks):
+        self.assertEqual([s[i % 16, i // 256, i // 16 % 16]
+                          for i in range(chunk.SECTION_SIZE)], blocks)
+
+    def test_section_packed(self):
+        for bpb, indices, palette in self.cases:
+            blocks = self.expected(indices, palette)
+            s = chunk.Section(section(bpb, indices, palette), True)
+            self.assertBlocks(s, blocks)
+            self.assertFalse(s.unpacked)
+
+            # Blocks spanning two longs are written too
+            for i, block in ((0, blocks[1]), (12, 4097), (1000, 7)):
+                s[i % 16, i // 256, i // 16 % 16] = blocks[i] = block
+            self.assertBlocks(s, blocks)
+            self.assertEqual(s.unpacked, bpb == 8)  # no room for 4097
+
+    def test_section_palette_grows(self):
+        indices = list(range(16)) * 256
+        s = chunk.Section(section(4, indices, list(range(16))), True)
+        s[0, 0, 0] = 100
+        self.assertEqual(s._bits_per_block, 5)
+        self.assertEqual((s[0, 0, 0], s[1, 0, 0], s[15, 15, 15]), (100, 1, 15))
+
+        for i in range(256):
+            s[i % 16, i // 256, i // 16 % 16] = 1000 + i
+        self.assertTrue(s.unpacked)
+        self.assertIsInstance(s._blocks, array.array)
+        self.assertEqual((s[0, 0, 0], s[15, 0, 15], s[0, 1, 0]),
+                         (1000, 1255, 0))
+
+    def test_section_direct(self):
+        s = chunk.Section(section(13, [5000] * 4096, None), True)
+        s[0, 0, 0] = 8191
+        self.assertFalse(s.unpacked)
+        s[1, 0, 0] = 8192
+        self.assertTrue(s.unpacked)
+        self.assertEqual((s[0, 0, 0], s[1, 0, 0], s[2, 0, 0]),
+                         (8191, 8192, 5000))
+
+    def test_section_interned(self):
+        a = chunk.Section(section(4, [0] * 4096, [1]), True)
+        b = chunk.Section(section(4, [0] * 4096, [2]), True)
+        self.assertIs(a._longs, b._longs)
+        self.assertIs(a.light._data, b.light._data)
+        self.assertEqual((a[3, 4, 5], b[3, 4, 5]), (1, 2))
+
+        a[3, 4, 5] = 9
+        a.light[3, 4, 5] = 15
+        self.assertIsNot(a._longs, b._longs)
+        self.assertIsNot(a.light._data, b.light._data)
+        self.assertEqual((a[3, 4, 5], b[3, 4, 5]), (9, 2))
+        self.assertEqual((a[0, 0, 0], b[0, 0, 0]), (1, 2))
+        self.assertEqual((a.light[3, 4, 5], b.light[3, 4, 5]), (15, 0))
+
+    def test_section_counts(self):
+        bpb, indices, palette = self.cases[1]
+        s = chunk.Section(section(bpb, indices, palette), True)
+        self.assertFalse(s.contains({5000}))
+        self.assertIsNone(s._counts)  # the palette alone was enough
+
+        counts = s.get_counts()
+        self.assertEqual(sum(counts.values()), chunk.SECTION_SIZE)
+        self.assertTrue(s.contains({palette[indices[0]]}))
+
+        s[0, 0, 0] = 5000
+        for i in range(chunk.SECTION_SIZE):
+            s[i % 16, i // 256, i // 16 % 16] = 7
+        self.assertEqual(s.get_counts(), {7: chunk.SECTION_SIZE})
+        self.assertFalse(s.contains({5000}))
+        self.assertEqual(chunk.Section.uniform(3).get_counts(),
+                         {3: chunk.SECTION_SIZE})
+
+    def test_missing_section(self):
+        c = empty_chunk(0, 0)
+        c[1, 40, 2] = 0
+        self.assertIsNone(c.sections[2])
+
+        c[1, 40, 2] = 5
+        s = c.sections[2]
+        self.assertEqual((c[1, 40, 2], c[1, 41, 2], c[1, 0, 2]), (5, 0, 0))
+        self.assertEqual(s.sky_light[1, 8, 2], 15)
+        self.assertIsNot(s._longs, chunk.Section.uniform()._longs)
+
+    def test_read_sections_pickled(self):
+        bpb, indices, palette = self.cases[0]
+        data = section(bpb, indices, palette).read()
+        data += section(4, [0] * 4096, [0]).read()
+        sections, biome_info = pickle.loads(pickle.dumps(
+            chunk.read_sections(data, 0b101, False)))
+
+        self.assertIsNone(biome_info)
+        self.assertIsNone(sections[1])
+        self.assertBlocks(sections[0], self.expected(indices, palette))
+        self.assertIs(sections[2]._longs, chunk.Section.uniform()._longs)
+        self.assertIs(sections[2].light._data,
+                      chunk.Section.uniform().light._data)
+
+    def heights(self, c):
+        return [max((y for y in range(chunk.CHUNK_HEIGHT)
+                     if blocks.is_solid(c[x, y, z])), default=None)
+                for z in range(16) for x in range(16)]
+
+    def test_height_at(self):
+        rng = random.Random(1)
+        # Mostly air, so that most columns are solid only further below
+        palette = [0, 1, 8, 31]
+        indices = [0 if rng.random() < 0.995 else rng.randrange(4)
+                   for _ in range(chunk.SECTION_SIZE)]
+        data = section(4, [0] * 4096, [1]).read()
+        data += section(4, indices, palette).read()
+        data += section(4, [0] * 4096, [8]).read()  # water is not solid
+
+        def check(use_numpy):
+            c = chunk.Chunk(types.ChunkData.create(
+                x=0, z=0, new_chunk=False, bit_mask=0b10101, data=data,
+                block_entities=[]))
+            c[0, 200, 0] = 31
+            c[1, 1, 1] = 0
+            heights = self.heights(c)
+            self.assertEqual([c.height_at(x, z) for z in range(16)
+                              for x in range(16)], heights)
+
+            # Removing the highest blocks finds the next ones below
+            for i in range(0, 256, 7):
+                c[i % 16, heights[i], i // 16] = 0
+            c[3, 100, 4] = 1
+            c[5, 40, 6] = 2
+            c[5, 40, 6] = 0
+            self.assertEqual([c.height_at(x, z) for z in range(16)
+                              for x in range(16)], self.heights(c))
+
+        self.with_and_without_numpy(check)
+
+
+if __name__ == '__main__':
+    unittest.main()
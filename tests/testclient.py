@@ -0,0 +1,32 @@
+import unittest
+from mibomi.network import Client
+from mibomi.datatypes import types
+
+
+class TestClient(unittest.TestCase):
+    def test_handled(self):
+        class Bot(Client):
+            async def on_chat_message(self, item):
+                pass
+
+        self.assertIn('chat_message', Bot.HANDLED)
+        self.assertIn('keep_alive', Bot.HANDLED)
+        self.assertNotIn('chat_message', Client.HANDLED)
+        self.assertNotIn('time_update', Bot.HANDLED)
+        self.assertNotIn('generic', Bot.HANDLED)
+
+        handled = Bot._find_handled_ids(types)
+        self.assertIn(types.ChatMessage.ID, handled)
+        self.assertIn(types.KeepAlive.ID, handled)
+        self.assertNotIn(types.EntityMetadata.ID, handled)
+
+    def test_generic_handles_all(self):
+        class Bot(Client):
+            async def on_generic(self, obj):
+                pass
+
+        self.assertEqual(Bot._find_handled_ids(types), frozenset(types.TYPES))
+
+
+if __name__ == '__main__':
+    unittest.main()
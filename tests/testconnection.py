@@ -0,0 +1,130 @@
+import asyncio
+import unittest
+import zlib
+from mibomi.network.connection import COALESCE_LIMIT, Connection, \
+    compress, decompress
+from mibomi.network.transport import PacketProtocol
+
+
+class TestCompression(unittest.TestCase):
+    def test_round_trip(self):
+        for data in (bytes(256), b'hello world ' * 50,
+                     bytes(range(256)) * 500):
+            for level in (-1, 0, 1, 9):
+                compressed = compress(data, level)
+                self.assertEqual(zlib.decompress(compressed), data)
+                self.assertEqual(decompress(compressed, len(data)), data)
+
+    def test_wrong_length(self):
+        compressed = zlib.compress(bytes(1000))
+        with self.assertRaises(ValueError):
+            decompress(compressed, 999)
+        with self.assertRaises(ValueError):
+            decompress(compressed, 1001)
+        with self.assertRaises(ValueError):
+            decompress(compressed[:-3], 1000)
+
+
+class FakeTransport(asyncio.Transport):
+    """
+    Keeps every call to `write` and `writelines`, in order.
+    """
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def write(self, data):
+        self.calls.append([bytes(data)])
+
+    def writelines(self, list_of_data):
+        self.calls.append([bytes(data) for data in list_of_data])
+
+
+class ConnectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def connect(self, **kwargs):
+        connection = Connection('localhost', loop=self.loop, **kwargs)
+        self.transport = FakeTransport()
+        connection._transport = self.transport
+        connection._protocol = PacketProtocol(self.loop)
+        connection._protocol.connection_made(self.transport)
+        return connection
+
+    def send(self, connection, *payloads):
+        async def send_all():
+            await asyncio.gather(*(
+                connection.send(0x01, payload) for payload in payloads))
+
+        self.loop.run_until_complete(send_all())
+
+
+class TestSend(ConnectionTestCase):
+    def test_order_near_threshold(self):
+        connection = self.connect(offload_threshold=100)
+        encrypted = []
+
+        def encrypt(frame):
+            # Like CFB8, the output depends on everything encrypted before
+            encrypted.append(bytes(frame))
+            return bytes(frame)
+
+        connection._encrypt = encrypt
+        # The frame is over the threshold, but the packet is not
+        big, small = bytes(98), b'abc'
+        self.send(connection, big, small)
+        frames = [b'c\x01' + big, b'\x04\x01' + small]
+        self.assertEqual(encrypted, frames)
+        self.assertEqual(self.transport.calls, [[frames[0]], [frames[1]]])
+
+    def test_order_offloaded(self):
+        connection = self.connect(offload_threshold=100)
+        connection._encrypt = bytes
+        big, small = bytes(200), b'abc'
+        self.send(connection, big, small, small)
+        self.assertEqual(self.transport.calls, [
+            [b'\xc9\x01\x01' + big], [b'\x04\x01' + small],
+            [b'\x04\x01' + small]])
+
+
+class TestCoalesce(ConnectionTestCase):
+    def test_corked(self):
+        connection = self.connect(coalesce=True)
+        connection.cork()
+        self.send(connection, b'a', b'bc')
+        self.assertEqual(self.transport.calls, [])
+
+        connection.flush()
+        self.assertEqual(self.transport.calls,
+                         [[b'\x02\x01a', b'\x03\x01bc']])
+
+        connection.uncork()
+        self.send(connection, b'd')
+        self.assertEqual(self.transport.calls[1:], [[b'\x02\x01d']])
+
+    def test_limit(self):
+        connection = self.connect(coalesce=True, offload_threshold=None)
+        connection.cork()
+        payload = bytes(COALESCE_LIMIT // 2)
+        self.send(connection, payload)
+        self.assertEqual(self.transport.calls, [])
+        self.send(connection, payload)
+        self.assertEqual(len(self.transport.calls), 1)
+        self.assertEqual(len(self.transport.calls[0]), 2)
+
+        self.send(connection, b'a')
+        connection.flush()
+        self.assertEqual(self.transport.calls[1:], [[b'\x02\x01a']])
+
+    def test_disabled(self):
+        connection = self.connect(coalesce=False)
+        connection.cork()
+        self.send(connection, b'a', b'b')
+        self.assertEqual(self.transport.calls,
+                         [[b'\x02\x01a'], [b'\x02\x01b']])
+
+
+if __name__ == '__main__':
+    unittest.main()
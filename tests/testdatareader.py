@@ -0,0 +1,62 @@
+import unittest
+from mibomi.datatypes import DataRW, DataReader
+
+
+class TestDataReader(unittest.TestCase):
+    def test_vari(self):
+        values = [0, 1, 2, 127, 128, 255, 2147483647, -1, -2147483648]
+        dataw = DataRW()
+        for value in values:
+            dataw.writevari32(value)
+
+        datar = DataReader(memoryview(dataw.getvalue()))
+        self.assertEqual(values, [datar.readvari32() for _ in values])
+        self.assertEqual(datar.read(), b'')
+
+        with self.assertRaises(ValueError):
+            DataReader(b'\xff\xff\xff\xff\xff\x01').readvari32()
+
+    def test_length(self):
+        datar = DataReader(b'abc')
+        self.assertEqual(datar.readexactly(2), b'ab')
+        for n in (-1, 2):
+            with self.assertRaises(ValueError):
+                datar.readexactly(n)
+        self.assertEqual(datar.read(), b'c')
+
+        with self.assertRaises(ValueError):
+            DataReader(b'\xff\xff\xff\xff\x0fabc').readstr()
+
+    def test_vari64(self):
+        values = [0, 300, 2 ** 40, 2 ** 63 - 1, -1, -2 ** 63]
+        dataw = DataRW()
+        for value in values:
+            dataw.writevari64(value)
+
+        datar = DataReader(dataw.getvalue())
+        self.assertEqual(values, [datar.readvari64() for _ in values])
+
+    def test_mixed(self):
+        dataw = DataRW()
+        dataw.writestr('héllo')
+        dataw.writefmt('?dh', True, 1.5, -3)
+        dataw.writepos((-1, -2, 99))
+        dataw.writeslot(None)
+        dataw.write(b'rest')
+
+        datar = DataReader(memoryview(dataw.getvalue()))
+        self.assertEqual(datar.readstr(), 'héllo')
+        self.assertEqual(datar.readfmt('?dh'), (True, 1.5, -3))
+        self.assertEqual(datar.readpos(), (-1, -2, 99))
+        self.assertIsNone(datar.readslot())
+        self.assertEqual(datar.read(2), b're')
+        self.assertEqual(datar.readleft(), b'st')
+
+    def test_entmeta(self):
+        data = b'\x00\x00\x05\x01\x01\x80\x01\x03\x06\x01\xff'
+        self.assertEqual(DataReader(data).readentmeta(),
+                         DataRW(data).readentmeta())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from mibomi.datatypes import DataRW, DataWriter
+
+
+class TestDataWriter(unittest.TestCase):
+    def test_same_as_datarw(self):
+        old = DataRW()
+        new = DataWriter()
+        for data in (old, new):
+            data.writevari32(340)
+            data.writevari32(-1)
+            data.writevari64(-2)
+            data.writestr('localhost')
+            data.writefmt('H', 25565)
+            data.writepos((-1, -2, 99))
+            data.writeslot(None)
+            data.write(b'x' * 200)
+
+        self.assertEqual(old.getvalue(), new.getvalue())
+
+    def test_frame(self):
+        data = DataWriter(0x0e)
+        data.writefmt('dddff?', 1.0, 2.0, 3.0, 4.0, 5.0, True)
+        payload = data.getvalue()
+        data.prefix(0)
+        data.prefix(len(data))
+        self.assertEqual(bytes(data.getbuffer()),
+                         bytes((len(payload) + 1, 0)) + payload)
+
+    def test_long_prefix(self):
+        data = DataWriter(size=0)
+        data.write(bytes(300))
+        data.prefix(len(data))
+        self.assertEqual(data.getvalue()[:2], b'\xac\x02')
+        self.assertEqual(len(data), 302)
+
+
+if __name__ == '__main__':
+    unittest.main()
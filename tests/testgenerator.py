@@ -0,0 +1,120 @@
+import io
+import struct
+import unittest
+from types import ModuleType
+
+from generator import generator, parser, pygen
+from mibomi.datatypes import DataReader, DataRW, DataWriter, StructVector
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def generate(source, compiled=True):
+    out = io.StringIO()
+    gen = pygen.PyGen(out)
+    generator.generate_header(gen, compiled=compiled)
+    structs = records = None
+    if compiled:
+        structs, records = {}, {}
+    definitions = list(parser.parse_str(source))
+    for definition in definitions:
+        generator.generate_class(gen, definition, structs, records)
+    generator.generate_footer(gen, definitions, compiled=compiled)
+
+    module = ModuleType('generated')
+    module.__package__ = 'mibomi.datatypes'
+    exec(out.getvalue(), module.__dict__)
+    return module
+
+
+SOURCE = '''
+move#1 id:vari32 dx:i16 dy:i16 on_ground:bool -> Move;
+point x:i8 y:i8 -> Point;
+line#3 points:vari32+Point -> Line;
+title#2 action:vari32 fade_in:i32 stay:i32 ?action?==?3 fade_in stay -> Title;
+'''
+
+
+class TestGenerator(unittest.TestCase):
+    def test_compiled(self):
+        module = generate(SOURCE)
+        data = DataReader(b'\x05' + struct.pack('>hh?', -1, 2, True) + b'!')
+        move = module.Move(data)
+        self.assertEqual((move.id, move.dx, move.dy, move.on_ground),
+                         (5, -1, 2, True))
+        self.assertEqual(data.read(), b'!')
+        self.assertFalse(hasattr(move, '__dict__'))
+        self.assertIn("'dx': -1", repr(move))
+
+    def test_compiled_condition(self):
+        module = generate(SOURCE)
+        title = module.Title(DataReader(b'\x03' + struct.pack('>ii', 1, 2)))
+        self.assertEqual((title.fade_in, title.stay), (1, 2))
+        title = module.Title(DataReader(b'\x00'))
+        self.assertIsNone(title.fade_in)
+
+    def test_compiled_vector(self):
+        module = generate(SOURCE)
+        data = DataReader(b'\x02\x01\xff\x03\x04!')
+        line = module.Line(data)
+        self.assertIsInstance(line.points, StructVector)
+        self.assertEqual([(p.x, p.y) for p in line.points], [(1, -1), (3, 4)])
+        self.assertEqual(line.points[-1].x, 3)
+        self.assertEqual(line.points.unpack(), [(1, -1), (3, 4)])
+        self.assertEqual(data.read(), b'!')
+
+        for count in (b'\xff\xff\xff\xff\x0f', b'\x03'):  # -1 and too many
+            with self.assertRaises(ValueError):
+                module.Line(DataReader(count + b'\x01\xff\x03\x04'))
+
+    @unittest.skipUnless(numpy, 'numpy is not installed')
+    def test_compiled_vector_array(self):
+        module = generate(SOURCE)
+        line = module.Line(DataReader(b'\x02\x01\xff\x03\x04'))
+        array = line.points.array()
+        self.assertEqual(list(array['x']), [1, 3])
+        self.assertEqual(list(array['y']), [-1, 4])
+
+    def test_write_fields(self):
+        module = generate(SOURCE)
+        for cls, fields in ((module.Move, (5, -1, 2, True)),
+                            (module.Title, (3, 1, 2)),
+                            (module.Title, (0,))):
+            expected = DataWriter()
+            cls.create(**dict(zip(cls.__slots__, fields))).write(expected)
+            data = DataWriter()
+            cls.write_fields(data, *fields)
+            self.assertEqual(data.getvalue(), expected.getvalue())
+
+        self.assertFalse(hasattr(module.Point, 'write_fields'))
+
+    def test_lazy(self):
+        module = generate(SOURCE)
+        self.assertNotIn('Line', vars(module))
+        self.assertNotIn('Point', vars(module))
+        self.assertEqual(module.NAMES[3], 'line')
+        self.assertIn(3, module.TYPES)
+
+        line = module.TYPES[3]
+        self.assertIs(line, module.Line)
+        self.assertEqual(line.__qualname__, 'Line')
+        self.assertIn('Point', vars(module))  # needed to read lines
+        self.assertNotIn('Move', vars(module))
+        with self.assertRaises(AttributeError):
+            module.Missing
+        with self.assertRaises(KeyError):
+            module.TYPES[4]
+
+    def test_legacy(self):
+        module = generate(SOURCE, compiled=False)
+        move = module.Move(DataRW(b'\x05' + struct.pack('>hh?', -1, 2, True)))
+        self.assertEqual((move.id, move.dx, move.dy, move.on_ground),
+                         (5, -1, 2, True))
+        self.assertTrue(hasattr(move, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from mibomi.network.inbox import PacketQueue, merge_relative_move
+
+
+class Move:
+    def __init__(self, id, dx):
+        self.id = id
+        self.dx = dx
+        self.dy = self.dz = 0
+        self.on_ground = True
+
+
+class Teleport:
+    def __init__(self, id):
+        self.id = id
+
+
+class Time:
+    pass
+
+
+class TestPacketQueue(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.queue = PacketQueue(self.loop, 2, {Move: merge_relative_move},
+                                 drop={Time})
+
+    def tearDown(self):
+        self.loop.close()
+
+    def put(self, packet):
+        self.loop.run_until_complete(self.queue.put(packet))
+
+    def get(self):
+        return self.loop.run_until_complete(self.queue.get())
+
+    def test_coalesce(self):
+        self.put(Move(1, 10))
+        self.put(Move(1, 5))
+        self.put(Move(2, 1))
+        self.assertEqual(len(self.queue), 2)
+        self.assertEqual(self.queue.merged, 1)
+        self.assertEqual(self.get().dx, 15)
+        self.assertEqual(self.get().id, 2)
+
+    def test_no_coalesce_past_other(self):
+        self.put(Move(1, 10))
+        self.put(Teleport(1))
+        self.loop.run_until_complete(self.queue.get())
+        self.put(Move(1, 5))
+        self.assertEqual(self.queue.merged, 0)
+        self.assertIsInstance(self.get(), Teleport)
+        self.assertEqual(self.get().dx, 5)
+
+    def test_no_coalesce_after_get(self):
+        self.put(Move(1, 10))
+        self.assertEqual(self.get().dx, 10)
+        self.put(Move(1, 5))
+        self.assertEqual(self.get().dx, 5)
+
+    def test_drop_when_full(self):
+        self.put(Teleport(1))
+        self.put(Teleport(2))
+        self.put(Time())
+        self.assertEqual(self.queue.dropped, 1)
+        self.assertEqual(len(self.queue), 2)
+
+    def test_backpressure(self):
+        async def producer():
+            for i in range(5):
+                await self.queue.put(Teleport(i))
+            self.queue.close()
+
+        async def consumer():
+            result = []
+            task = self.loop.create_task(producer())
+            await asyncio.sleep(0)
+            self.assertEqual(len(self.queue), 2)
+            try:
+                while True:
+                    result.append((await self.queue.get()).id)
+                    self.assertLessEqual(len(self.queue), 2)
+            except ConnectionError:
+                pass
+            await task
+            return result
+
+        self.assertEqual(self.loop.run_until_complete(consumer()),
+                         [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
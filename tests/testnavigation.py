@@ -0,0 +1,136 @@
+import asyncio
+import concurrent.futures
+import time
+import unittest
+
+from mibomi.datatypes import World, chunk
+from mibomi.navigation import Grid, PathFinder, find_path, pathfinder
+from tests.utils import empty_chunk
+
+
+def flat_world(radius=2, floor=60):
+    """
+    Returns a world with a floor of stone up to the given height.
+    """
+    world = World()
+    for cx in range(-radius, radius):
+        for cz in range(-radius, radius):
+            c = empty_chunk(cx, cz)
+            for sy in range(floor // 16 + 1):
+                c.sections[sy] = chunk.Section.uniform(1)
+            world.feed_chunk(c)
+
+    for x in range(-radius * 16, radius * 16):
+        for z in range(-radius * 16, radius * 16):
+            for y in range(floor, 16 * (floor // 16 + 1)):
+                world[x, y, z] = 0
+    return world
+
+
+class TestNavigation(unittest.TestCase):
+    def setUp(self):
+        self.world = flat_world()
+
+    def assertWalkable(self, path, start, goal):
+        self.assertEqual((path[0], path[-1]), (start, goal))
+        grid = Grid(self.world)
+        for a, b in zip(path, path[1:]):
+            self.assertTrue(grid.can_stand(*b))
+            self.assertEqual(abs(a[0] - b[0]) + abs(a[2] - b[2]), 1)
+
+    def test_straight(self):
+        path = find_path(Grid(self.world), (0, 60, 0), (5, 60, 0))
+        self.assertEqual(path, [(x, 60, 0) for x in range(6)])
+
+    def test_around_wall(self):
+        for z in range(-10, 10):
+            for y in (60, 61, 62):
+                self.world[3, y, z] = 1
+        path = find_path(Grid(self.world), (0, 60, 0), (6, 60, 0))
+        self.assertWalkable(path, (0, 60, 0), (6, 60, 0))
+        self.assertGreater(len(path), 20)
+        self.assertTrue(all(not -10 <= z < 10 for x, _, z in path if x == 3))
+
+    def test_jump_and_drop(self):
+        self.world[2, 60, 0] = 1
+        self.world[3, 60, 0] = 1
+        self.world[4, 59, 0] = 0  # a hole to drop into
+        # A corridor, so that there's no way around them
+        for x, z in [(x, z) for x in range(-1, 8) for z in (-1, 1)] + [
+                (-1, 0), (7, 0)]:
+            for y in (60, 61, 62):
+                self.world[x, y, z] = 1
+        path = find_path(Grid(self.world), (0, 60, 0), (6, 60, 0))
+        self.assertWalkable(path, (0, 60, 0), (6, 60, 0))
+        self.assertIn((2, 61, 0), path)
+        self.assertIn((4, 59, 0), path)
+
+    def test_unreachable(self):
+        for x, z in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            for y in (60, 61, 62):
+                self.world[x, y, z] = 1
+        self.assertIsNone(find_path(
+            Grid(self.world), (0, 60, 0), (6, 60, 0)))
+        # Not even past the known chunks
+        self.assertIsNone(find_path(
+            Grid(self.world), (5, 60, 0), (40, 60, 0), max_nodes=5000))
+
+    def test_lava(self):
+        for z in range(-32, 32):
+            self.world[3, 59, z] = 11
+        self.assertIsNone(find_path(
+            Grid(self.world), (0, 60, 0), (6, 60, 0), max_nodes=5000))
+
+    def test_cached_until_written(self):
+        section = self.world.get_chunk(0, 0).sections[3]
+        grid = Grid(self.world)
+        self.assertTrue(grid.can_stand(5, 60, 5))
+        kinds = section.classify(pathfinder.WALKABILITY)
+        self.assertIs(section.classify(pathfinder.WALKABILITY), kinds)
+
+        self.world[5, 59, 5] = 0
+        self.assertFalse(Grid(self.world).can_stand(5, 60, 5))
+
+    def test_deadline(self):
+        grid = Grid(self.world)
+        self.assertIsNone(find_path(
+            grid, (-30, 60, -30), (30, 60, 30), deadline=time.perf_counter()))
+        self.assertIsNotNone(find_path(
+            grid, (-30, 60, -30), (30, 60, 30),
+            deadline=time.perf_counter() + 60))
+
+    def test_snapshot(self):
+        section = self.world.get_chunk(0, 0).sections[3]
+        grid = Grid.snapshot(self.world, -32, -32, 31, 31)
+        self.assertIsNone(section._classified)  # Not until it's used
+
+        self.world[5, 60, 5] = 1
+        self.assertTrue(grid.can_stand(5, 60, 5))
+        self.assertFalse(grid.can_stand(5, 60, 40))  # Not copied
+        self.assertFalse(Grid(self.world).can_stand(5, 60, 5))
+
+    def test_path_finder(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        for z in range(-10, 10):
+            self.world[3, 60, z] = 1
+            self.world[3, 61, z] = 1
+
+        finder = PathFinder(self.world, slice_time=0)
+        path = loop.run_until_complete(
+            finder.find_path((0.5, 60, 0.5), (6.2, 60, 0.7)))
+        self.assertWalkable(path, (0, 60, 0), (6, 60, 0))
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            finder = PathFinder(self.world, executor=executor)
+            path = loop.run_until_complete(
+                finder.find_path((-30, 60, -30), (30, 60, 30)))
+        self.assertWalkable(path, (-30, 60, -30), (30, 60, 30))
+
+        finder = PathFinder(self.world, timeout=0)
+        self.assertIsNone(loop.run_until_complete(
+            finder.find_path((-30, 60, -30), (30, 60, 30))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from mibomi import datatypes, protocols
+
+
+class TestProtocols(unittest.TestCase):
+    def test_load(self):
+        self.assertIn(340, protocols.SUPPORTED)
+        protocol = protocols.load(340)
+        self.assertEqual(protocol.VERSION, 340)
+        self.assertEqual(protocol.types.NAMES[protocol.types.KeepAlive.ID],
+                         'keep_alive')
+        self.assertEqual(protocol.serverbound.ChatMessage.NAME,
+                         'chat_message')
+
+    def test_load_default(self):
+        self.assertIs(protocols.load(), protocols.load(protocols.DEFAULT))
+        self.assertIs(datatypes.types, protocols.load().types)
+        self.assertIs(datatypes.serverbound, protocols.load().serverbound)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            protocols.load(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from mibomi.network.transport import PacketProtocol, unpack_varint
+
+
+class FakeTransport(asyncio.Transport):
+    def __init__(self):
+        super().__init__()
+        self.paused = False
+
+    def pause_reading(self):
+        self.paused = True
+
+    def resume_reading(self):
+        self.paused = False
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.protocol = PacketProtocol(self.loop)
+        self.protocol.connection_made(FakeTransport())
+
+    def tearDown(self):
+        self.loop.close()
+
+    def feed(self, data, protocol=None):
+        protocol = protocol or self.protocol
+        while data:
+            buffer = protocol.get_buffer(len(data))
+            n = min(len(buffer), len(data))
+            buffer[:n] = data[:n]
+            protocol.buffer_updated(n)
+            data = data[n:]
+
+    def read_frame(self, decrypt=lambda x: x):
+        return self.loop.run_until_complete(
+            self.protocol.read_frame(decrypt))
+
+    def test_frames(self):
+        self.feed(b'\x03abc\x00\x02de')
+        self.assertEqual(self.read_frame(), b'abc')
+        self.assertEqual(self.read_frame(), b'')
+        self.assertEqual(self.read_frame(), b'de')
+
+    def test_split(self):
+        payload = bytes(range(200))
+        frame = b'\xc8\x01' + payload
+
+        async def feed():
+            for i in range(len(frame)):
+                self.feed(frame[i:i + 1])
+                await asyncio.sleep(0)
+
+        task = self.loop.create_task(feed())
+        self.assertEqual(self.read_frame(), payload)
+        self.loop.run_until_complete(task)
+
+    def test_decrypt_once(self):
+        def decrypt(data):
+            return bytes(x ^ 0xff for x in data)
+
+        self.feed(decrypt(b'\x01a\x01'))
+        self.assertEqual(self.read_frame(decrypt), b'a')
+        self.feed(decrypt(b'b'))
+        self.assertEqual(self.read_frame(decrypt), b'b')
+
+    def test_decrypt_offloaded(self):
+        def decrypt(data):
+            return bytes(x ^ 0xff for x in data)
+
+        arriving = [decrypt(b'c')]
+
+        async def run(function, data):
+            result = await self.loop.run_in_executor(None, function, data)
+            if arriving:
+                self.feed(arriving.pop())  # arrives while decrypting
+            return result
+
+        self.feed(decrypt(b'\x02ab\x01'))
+        self.assertEqual(self.loop.run_until_complete(
+            self.protocol.read_frame(decrypt, run)), b'ab')
+        self.assertEqual(self.loop.run_until_complete(
+            self.protocol.read_frame(decrypt, run)), b'c')
+
+    def test_reuse(self):
+        protocol = PacketProtocol(self.loop, size=32 * 1024)
+        protocol.connection_made(FakeTransport())
+        frame = b'\xe8\x07' + bytes(1000)
+        for _ in range(100):
+            self.feed(frame, protocol)
+            self.assertEqual(
+                self.loop.run_until_complete(
+                    protocol.read_frame(lambda x: x)),
+                bytes(1000)
+            )
+        self.assertEqual(len(protocol._buffer), 32 * 1024)
+
+    def test_grow(self):
+        protocol = PacketProtocol(self.loop, size=1024)
+        protocol.connection_made(FakeTransport())
+        payload = bytes(range(256)) * 400
+        self.feed(b'\x01x\x80\xa0\x06' + payload, protocol)
+        first = self.loop.run_until_complete(
+            protocol.read_frame(lambda x: x))
+        self.assertEqual(first, b'x')
+        self.assertEqual(
+            self.loop.run_until_complete(protocol.read_frame(lambda x: x)),
+            payload
+        )
+
+    def test_varint(self):
+        self.assertEqual(unpack_varint(b'\x80\x01'), (128, 2))
+        self.assertEqual(unpack_varint(b'\x00\x80\x01', 1), (128, 2))
+        self.assertEqual(unpack_varint(b'\x80'), (None, 0))
+        with self.assertRaises(ValueError):
+            unpack_varint(b'\xff' * 5)
+
+    def test_closed(self):
+        self.feed(b'\x05ab')
+        self.protocol.connection_lost(None)
+        with self.assertRaises(ConnectionError):
+            self.read_frame()
+
+    def test_drain(self):
+        self.protocol.pause_writing()
+        first = self.loop.create_task(self.protocol.drain())
+        second = self.loop.create_task(self.protocol.drain())
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertFalse(first.done() or second.done())
+
+        self.protocol.resume_writing()
+        self.loop.run_until_complete(asyncio.wait_for(
+            asyncio.gather(first, second), 1))
+
+    def test_drain_lost(self):
+        self.protocol.pause_writing()
+        first = self.loop.create_task(self.protocol.drain())
+        second = self.loop.create_task(self.protocol.drain())
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+        self.protocol.connection_lost(ConnectionResetError())
+        for task in (first, second):
+            with self.assertRaises(ConnectionResetError):
+                self.loop.run_until_complete(asyncio.wait_for(task, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
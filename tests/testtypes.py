@@ -0,0 +1,78 @@
+import unittest
+import uuid
+
+from mibomi.datatypes import (
+    DataReader, DataWriter, Position, serverbound, types
+)
+
+
+def round_trip(packet, *params):
+    data = DataWriter()
+    packet.write(data, *params)
+    payload = data.getvalue()
+    decoded = type(packet)(DataReader(payload), *params)
+    again = DataWriter()
+    decoded.write(again, *params)
+    return decoded, payload, again.getvalue()
+
+
+class TestTypes(unittest.TestCase):
+    def test_round_trip(self):
+        move = types.EntityRelativeMove.create(
+            id=300, dx=-5, dy=7, dz=0, on_ground=True)
+        decoded, old, new = round_trip(move)
+        self.assertEqual(old, new)
+        self.assertEqual((decoded.id, decoded.dx, decoded.on_ground),
+                         (300, -5, True))
+
+    def test_condition(self):
+        title = types.Title.create(action=3, fade_in=1, stay=2, fade_out=3)
+        decoded, old, new = round_trip(title)
+        self.assertEqual(old, new)
+        self.assertEqual((decoded.title, decoded.stay), (None, 2))
+
+    def test_records(self):
+        record = types.ExplosionRecord._make
+        explosion = types.Explosion.create(
+            x=1.0, y=2.0, z=3.0, radius=4.0, vx=0.0, vy=0.0, vz=0.0,
+            records=[record((1, -2, 3)), record((0, 0, -1))])
+        decoded, old, new = round_trip(explosion)
+        self.assertEqual(old, new)
+        self.assertEqual(decoded.records.unpack(), [(1, -2, 3), (0, 0, -1)])
+
+    def test_params(self):
+        player = types.Player.create(uuid=uuid.uuid4(), gamemode=1)
+        decoded, old, new = round_trip(player, 1)
+        self.assertEqual(old, new)
+        self.assertEqual((decoded.uuid, decoded.gamemode, decoded.ping),
+                         (player.uuid, 1, None))
+
+    def test_entity_metadata(self):
+        metadata = [(0, 0, 4), (1, 300), (2, 'name'), (6, True),
+                    (3, 9, Position(1, 2, 3)), (4, 12, None)]
+        data = DataWriter()
+        types.EntityMetadata.create(id=1, metadata=metadata).write(data)
+        decoded = types.EntityMetadata(DataReader(data.getvalue()))
+        self.assertEqual(decoded.metadata, [
+            (0, 4), (1, 300), (2, 'name'), (6, True),
+            (3, Position(1, 2, 3)), (4, None)])
+
+    def test_serverbound(self):
+        use = serverbound.UseEntity.create(target=5, type=2, x=1.0, y=2.0,
+                                           z=3.0, hand=1)
+        decoded, old, new = round_trip(use)
+        self.assertEqual(old, new)
+        self.assertEqual((decoded.x, decoded.hand), (1.0, 1))
+
+        use = serverbound.UseEntity.create(target=5, type=1)
+        decoded, old, new = round_trip(use)
+        self.assertEqual(old, new)
+        self.assertEqual(len(old), 2)
+
+    def test_create_unknown(self):
+        with self.assertRaises(TypeError):
+            types.KeepAlive.create(id=1, other=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
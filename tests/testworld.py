@@ -0,0 +1,196 @@
+import asyncio
+import random
+import unittest
+
+from mibomi.datatypes import PENDING, World
+from tests.utils import NumPyMixin, empty_chunk
+
+
+class TestWorld(NumPyMixin, unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.world = World()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_pending(self):
+        future = self.loop.create_future()
+        self.world.feed_pending(1, -1, future)
+        self.assertIs(self.world[20, 5, -3], PENDING)
+        self.assertEqual(self.world[0, 5, 0], 0)
+
+        self.world[20, 5, -3] = 7
+        future.set_result(empty_chunk(1, -1))
+        waited = self.loop.run_until_complete(self.world.wait_chunk(1, -1))
+        self.assertIs(waited, self.world.get_chunk(1, -1))
+        self.assertEqual(self.world[20, 5, -3], 7)
+
+    def test_pending_replaced(self):
+        future = self.loop.create_future()
+        self.world.feed_pending(0, 0, future)
+        self.world.feed_chunk(empty_chunk(0, 0))
+        self.world[1, 2, 3] = 4
+
+        future.set_result(empty_chunk(0, 0))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(self.world[1, 2, 3], 4)
+
+    def test_pending_failed(self):
+        future = self.loop.create_future()
+        self.world.feed_pending(0, 0, future)
+        future.set_exception(ValueError('bad chunk'))
+        with self.assertLogs('mibomi.datatypes.world', 'ERROR'):
+            self.assertIsNone(self.loop.run_until_complete(
+                self.world.wait_chunk(0, 0)))
+        self.assertEqual(self.world[1, 2, 3], 0)
+
+    def test_height_at(self):
+        self.world.feed_chunk(empty_chunk(-1, 0))
+        self.world.feed_pending(0, 0, self.loop.create_future())
+        self.assertIsNone(self.world.height_at(-1, 3))
+        self.world[-1, 70, 3] = 1
+        self.world[-1, 20, 3] = 1
+        self.assertEqual(self.world.height_at(-1, 3), 70)
+        self.assertIs(self.world.height_at(1, 3), PENDING)
+        self.assertIsNone(self.world.height_at(100, 3))
+
+    def test_unload(self):
+        self.world.feed_chunk(empty_chunk(0, 0))
+        self.world[1, 2, 3] = 4
+        self.world.unload_chunk(0, 0)
+        self.assertEqual(len(self.world), 0)
+        self.assertEqual(self.world.memory, 0)
+        self.assertIsNone(self.world.get_chunk(0, 0))
+        self.assertEqual(self.world[1, 2, 3], 0)
+
+    def test_memory(self):
+        self.world.feed_chunk(empty_chunk(0, 0))
+        empty = self.world.memory
+        self.world[1, 2, 3] = 4
+        self.assertGreater(self.world.memory, empty)
+        self.assertEqual(self.world.memory,
+                         self.world.get_chunk(0, 0).memory)
+
+    def test_memory_caches(self):
+        self.world.feed_chunk(empty_chunk(0, 0))
+        self.world[1, 2, 3] = 4
+        self.world[1, 20, 3] = 5
+        c = self.world.get_chunk(0, 0)
+        for read in (lambda: self.world.find_nearest({4}, (0, 0, 0), 8),
+                     lambda: self.world.height_at(1, 3),
+                     lambda: c.sections[1].classify(bytes(range(256)) * 256)):
+            used = self.world.memory
+            read()
+            self.assertIn((0, 0), self.world._memory)  # Not measured again
+            self.assertGreater(self.world.memory, used)
+            self.assertEqual(self.world.memory, c.memory)
+
+    def test_evict_lru(self):
+        size = empty_chunk(0, 0).memory
+        self.world.memory_budget = 2 * size
+        self.world.feed_chunk(empty_chunk(0, 0))
+        self.world.feed_chunk(empty_chunk(1, 0))
+        self.world[0, 0, 0]  # (1, 0) is now the least recently used
+        self.world.feed_chunk(empty_chunk(2, 0))
+        self.assertEqual(len(self.world), 2)
+        self.assertIsNone(self.world.get_chunk(1, 0))
+        self.assertLessEqual(self.world.memory, 2 * size)
+
+    def test_evict_distance(self):
+        self.world.memory_budget = 2 * empty_chunk(0, 0).memory
+        self.world.center = lambda: (40.5, 64, 8)
+        for x in (0, 1, 2):
+            self.world.feed_chunk(empty_chunk(x, 0))
+            self.world[x * 16, 0, 0]
+        self.assertEqual(len(self.world), 2)
+        self.assertIsNone(self.world.get_chunk(0, 0))
+
+    def random_world(self):
+        rng = random.Random(0)
+        for cx in (-1, 0):
+            for cz in (0, 1):
+                self.world.feed_chunk(empty_chunk(cx, cz))
+        for _ in range(2000):
+            xyz = rng.randrange(-16, 16), rng.randrange(60), \
+                rng.randrange(0, 32)
+            self.world[xyz] = rng.randrange(1, 300)
+        self.world.feed_pending(1, 1, self.loop.create_future())
+
+    def block(self, x, y, z):
+        block = self.world[x, y, z]
+        return 0 if block is PENDING else block
+
+    def test_get_box(self):
+        self.random_world()
+        box = -20, -3, 5, 20, 40, 33  # past the known chunks
+        expected = [self.block(x, y, z)
+                    for y in range(box[1], box[4])
+                    for z in range(box[2], box[5])
+                    for x in range(box[0], box[3])]
+
+        def check(use_numpy):
+            blocks = self.world.get_box(*box)
+            self.assertEqual([int(b) for b in blocks.ravel()]
+                             if use_numpy else list(blocks), expected)
+
+        self.with_and_without_numpy(check)
+
+    def test_get_blocks(self):
+        self.random_world()
+        rng = random.Random(1)
+        coords = [(rng.randrange(-20, 20), rng.randrange(-2, 70),
+                   rng.randrange(-5, 35)) for _ in range(500)]
+        expected = [self.block(*xyz) for xyz in coords]
+
+        def check(use_numpy):
+            blocks = self.world.get_blocks(coords)
+            self.assertEqual([int(b) for b in blocks], expected)
+
+        self.with_and_without_numpy(check)
+
+    def test_find_nearest(self):
+        self.random_world()
+        rng = random.Random(2)
+        cases = []
+        for _ in range(20):
+            origin = rng.randrange(-30, 30), rng.randrange(70), \
+                rng.randrange(-10, 40)
+            ids = {rng.randrange(1, 300) for _ in range(3)}
+            radius = rng.randrange(5, 30)
+            expected = min((
+                (x - origin[0]) ** 2 + (y - origin[1]) ** 2
+                + (z - origin[2]) ** 2
+                for x in range(origin[0] - radius, origin[0] + radius + 1)
+                for y in range(max(origin[1] - radius, 0),
+                               min(origin[1] + radius + 1, 256))
+                for z in range(origin[2] - radius, origin[2] + radius + 1)
+                if self.block(x, y, z) in ids
+            ), default=None)
+            if expected is not None and expected > radius ** 2:
+                expected = None
+            cases.append((ids, origin, radius, expected))
+
+        def check(use_numpy):
+            for ids, origin, radius, expected in cases:
+                found = self.world.find_nearest(ids, origin, radius)
+                if expected is None:
+                    self.assertIsNone(found)
+                else:
+                    self.assertIn(self.world[found], ids)
+                    self.assertEqual(sum((a - b) ** 2 for a, b in zip(
+                        found, origin)), expected)
+
+        self.with_and_without_numpy(check)
+
+        # Kept up to date with the blocks written after searching
+        self.world[-30, 2, 3] = 999
+        self.world[0, 0, 0] = 999
+        self.assertEqual(self.world.find_nearest({999}, (3, 0, 0), 16),
+                         (0, 0, 0))
+        self.world[0, 0, 0] = 1
+        self.assertIsNone(self.world.find_nearest({999}, (3, 0, 0), 16))
+
+
+if __name__ == '__main__':
+    unittest.main()
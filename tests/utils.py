@@ -0,0 +1,33 @@
+"""
+Helpers shared by the tests of the chunks, the world and navigation.
+"""
+from mibomi.datatypes import chunk, types
+
+
+def empty_chunk(x, z):
+    """
+    Returns a chunk at the given position without any section.
+    """
+    return chunk.Chunk(types.ChunkData.create(
+        x=x, z=z, new_chunk=False, bit_mask=0, data=b'', block_entities=[]))
+
+
+class NumPyMixin:
+    """
+    Mixin for test cases checking the same code with and without NumPy.
+    """
+    def with_and_without_numpy(self, check):
+        """
+        Calls ``check(use_numpy)`` in a subtest without NumPy, and then
+        in another one with it, which is skipped if it's not installed.
+        """
+        for use_numpy in (False, True):
+            with self.subTest(use_numpy=use_numpy):
+                if use_numpy and not chunk.numpy_or_none():
+                    self.skipTest('numpy is not installed')
+
+                chunk.USE_NUMPY = use_numpy
+                try:
+                    check(use_numpy)
+                finally:
+                    chunk.USE_NUMPY = True